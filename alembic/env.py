@@ -3,12 +3,12 @@ from sqlalchemy import engine_from_config, pool
 from alembic import context
 
 from app.models import Base   # <-- Your models Base
-from app.config import settings  # <-- load DATABASE_URL from settings.py
+from app.database import DATABASE_URL  # <-- same URL the app uses (SQLite or Azure SQL)
 
 
 # --- Alembic Config ---
 config = context.config
-sync_url = settings.DATABASE_URL.replace("+aiosqlite", "")
+sync_url = DATABASE_URL.replace("+aiosqlite", "").replace("+aioodbc", "+pyodbc")
 
 config.set_main_option("sqlalchemy.url", sync_url)
 
@@ -0,0 +1,30 @@
+"""Add course thumbnail variants
+
+Revision ID: 3b9d41c7e2a5
+Revises: e677cac86888
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d41c7e2a5'
+down_revision: Union[str, Sequence[str], None] = 'e677cac86888'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('courses') as batch_op:
+        batch_op.add_column(sa.Column('thumbnail_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('courses') as batch_op:
+        batch_op.drop_column('thumbnail_variants')
@@ -0,0 +1,56 @@
+"""Unique paid purchase per user and course
+
+Revision ID: 5c2e8f1a9d34
+Revises: 3b9d41c7e2a5
+Create Date: 2026-10-18 14:05:12.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e8f1a9d34'
+down_revision: Union[str, Sequence[str], None] = '3b9d41c7e2a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep the first paid purchase of each (user, course); later ones are
+    # double submits
+    purchases = sa.table(
+        'purchases',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('course_id', sa.Integer),
+        sa.column('paid', sa.Boolean),
+    )
+    firsts = (
+        sa.select(sa.func.min(purchases.c.id).label('keep_id'))
+        .where(purchases.c.paid == sa.true())
+        .group_by(purchases.c.user_id, purchases.c.course_id)
+        .subquery('firsts')
+    )
+    op.execute(
+        purchases.delete().where(
+            purchases.c.paid == sa.true(),
+            purchases.c.id.not_in(sa.select(firsts.c.keep_id)),
+        )
+    )
+
+    op.create_index(
+        'uq_purchases_user_course_paid', 'purchases', ['user_id', 'course_id'],
+        unique=True,
+        sqlite_where=sa.text('paid = 1'),
+        mssql_where=sa.text('paid = 1'),
+        postgresql_where=sa.text('paid'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_purchases_user_course_paid', table_name='purchases')
@@ -0,0 +1,28 @@
+"""Index lessons by course
+
+Revision ID: c7f3a2e91b58
+Revises: 9a41d6c3b7e0
+Create Date: 2026-10-18 20:42:03.118530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f3a2e91b58'
+down_revision: Union[str, Sequence[str], None] = '9a41d6c3b7e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_lessons_course_id'), 'lessons', ['course_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_lessons_course_id'), table_name='lessons')
@@ -0,0 +1,37 @@
+"""Add search_changes table
+
+Revision ID: d1c8f4a7b295
+Revises: b6d3e9a4c172
+Create Date: 2026-10-18 23:48:10.512733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1c8f4a7b295'
+down_revision: Union[str, Sequence[str], None] = 'b6d3e9a4c172'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'search_changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('doc_type', sa.String(length=10), nullable=False),
+        sa.Column('doc_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_search_changes_created_at', 'search_changes', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_search_changes_created_at', table_name='search_changes')
+    op.drop_table('search_changes')
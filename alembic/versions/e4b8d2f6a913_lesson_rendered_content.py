@@ -0,0 +1,38 @@
+"""Store rendered lesson content
+
+Revision ID: e4b8d2f6a913
+Revises: c7f3a2e91b58
+Create Date: 2026-10-18 21:37:45.502817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8d2f6a913'
+down_revision: Union[str, Sequence[str], None] = 'c7f3a2e91b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('lessons') as batch_op:
+        batch_op.add_column(sa.Column('content_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('video_embed_id', sa.String(length=64), nullable=True))
+
+    # Schema only. Existing lessons keep content_hash NULL, which views
+    # render on the fly; `python -m app.content` backfills them in id
+    # batches with the renderer of the day, outside this migration.
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('lessons') as batch_op:
+        batch_op.drop_column('video_embed_id')
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('content_html')
@@ -0,0 +1,55 @@
+"""Order lessons within a course
+
+Revision ID: f2a7c5d1e086
+Revises: e4b8d2f6a913
+Create Date: 2026-10-18 22:14:09.663120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c5d1e086'
+down_revision: Union[str, Sequence[str], None] = 'e4b8d2f6a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('lessons') as batch_op:
+        batch_op.add_column(sa.Column('position', sa.Integer(), nullable=True))
+
+    # Existing lessons keep their id order: 1, 2, ... per course
+    lessons = sa.table(
+        'lessons',
+        sa.column('id', sa.Integer),
+        sa.column('course_id', sa.Integer),
+        sa.column('position', sa.Integer),
+    )
+    earlier = lessons.alias('earlier')
+    op.execute(
+        lessons.update().values(position=(
+            sa.select(sa.func.count())
+            .select_from(earlier)
+            .where(earlier.c.course_id == lessons.c.course_id, earlier.c.id <= lessons.c.id)
+            .scalar_subquery()
+        ))
+    )
+
+    with op.batch_alter_table('lessons') as batch_op:
+        batch_op.alter_column('position', existing_type=sa.Integer(), nullable=False)
+        # The (course_id, position) index also serves lookups by course_id
+        batch_op.drop_index('ix_lessons_course_id')
+        batch_op.create_index('ix_lessons_course_position', ['course_id', 'position'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('lessons') as batch_op:
+        batch_op.drop_index('ix_lessons_course_position')
+        batch_op.create_index('ix_lessons_course_id', ['course_id'], unique=False)
+        batch_op.drop_column('position')
@@ -0,0 +1,234 @@
+# app/assets.py
+# -------------------------------------------------------
+# Fingerprinted, precompressed static assets.
+#
+# The manifest maps each file under app/static to a content-hashed name
+# (css/style.css -> css/style.1a2b3c4d5e.css) and, for text files, to
+# gzip/brotli copies in ASSET_BUILD_DIR. Templates link to the hashed
+# names through asset_url(), so those URLs can be cached forever by
+# browsers; AssetStaticFiles serves them with `immutable` caching and the
+# best precompressed encoding, using stat results taken at build time.
+#
+#   python -m app.assets   # build the manifest (done in the Docker image)
+# -------------------------------------------------------
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+from .settings import settings
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip copies are produced without it
+    brotli = None
+
+STATIC_DIR = os.path.join("app", "static")
+STATIC_URL = "/static"
+
+TEXT_EXTENSIONS = {".css", ".js", ".mjs", ".svg", ".html", ".json", ".txt", ".map", ".xml"}
+MIN_COMPRESS_SIZE = 256
+
+# Runtime uploads are not part of the build
+EXCLUDED_DIRS = {"uploads"}
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@dataclass
+class Asset:
+    logical: str                 # "css/style.css"
+    fingerprinted: str           # "css/style.1a2b3c4d5e.css"
+    digest: str
+    media_type: str
+    path: str
+    stat: os.stat_result = field(repr=False)
+    # encoding -> (file path, stat result)
+    encodings: Dict[str, Tuple[str, os.stat_result]] = field(default_factory=dict, repr=False)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+class AssetManifest:
+    def __init__(self, static_dir: str, build_dir: str):
+        self.static_dir = static_dir
+        self.build_dir = build_dir
+        self.by_logical: Dict[str, Asset] = {}
+        self.by_fingerprint: Dict[str, Asset] = {}
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.build_dir, "manifest.json")
+
+    def url(self, logical: str) -> str:
+        logical = logical.lstrip("/")
+        asset = self.by_logical.get(logical)
+        return f"{STATIC_URL}/{asset.fingerprinted if asset else logical}"
+
+    # -----------------------------
+    # Build / load
+    # -----------------------------
+    def build(self) -> int:
+        entries = {}
+
+        for dirpath, dirnames, filenames in os.walk(self.static_dir):
+            if dirpath == self.static_dir:
+                dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                logical = os.path.relpath(path, self.static_dir).replace(os.sep, "/")
+
+                with open(path, "rb") as f:
+                    data = f.read()
+
+                digest = hashlib.sha256(data).hexdigest()[:10]
+                stem, ext = os.path.splitext(logical)
+                fingerprinted = f"{stem}.{digest}{ext}"
+
+                encodings = {}
+                if ext.lower() in TEXT_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+                    compressors = [("gzip", ".gz", lambda d: gzip.compress(d, 9, mtime=0))]
+                    if brotli is not None:
+                        compressors.append(("br", ".br", lambda d: brotli.compress(d, quality=11)))
+
+                    for encoding, suffix, compress in compressors:
+                        packed = compress(data)
+                        if len(packed) >= len(data):
+                            continue
+                        rel = fingerprinted + suffix
+                        out = os.path.join(self.build_dir, rel)
+                        os.makedirs(os.path.dirname(out), exist_ok=True)
+                        with open(out, "wb") as f:
+                            f.write(packed)
+                        encodings[encoding] = rel
+
+                entries[logical] = {
+                    "fingerprinted": fingerprinted,
+                    "digest": digest,
+                    "encodings": encodings,
+                }
+
+        os.makedirs(self.build_dir, exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump(entries, f, indent=2, sort_keys=True)
+
+        self._index(entries)
+        return len(entries)
+
+    def load(self) -> bool:
+        try:
+            with open(self.manifest_path) as f:
+                entries = json.load(f)
+            self._index(entries)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def _index(self, entries: dict) -> None:
+        by_logical, by_fingerprint = {}, {}
+
+        for logical, entry in entries.items():
+            path = os.path.join(self.static_dir, *logical.split("/"))
+            try:
+                stat = os.stat(path)
+                encodings = {}
+                for encoding, rel in entry["encodings"].items():
+                    packed = os.path.join(self.build_dir, *rel.split("/"))
+                    encodings[encoding] = (packed, os.stat(packed))
+            except OSError:
+                continue  # file removed since the manifest was built
+
+            asset = Asset(
+                logical=logical,
+                fingerprinted=entry["fingerprinted"],
+                digest=entry["digest"],
+                media_type=mimetypes.guess_type(logical)[0] or "application/octet-stream",
+                path=path,
+                stat=stat,
+                encodings=encodings,
+            )
+            by_logical[logical] = asset
+            by_fingerprint[asset.fingerprinted] = asset
+
+        # Swap both maps at once
+        self.by_logical, self.by_fingerprint = by_logical, by_fingerprint
+
+
+manifest = AssetManifest(STATIC_DIR, settings.ASSET_BUILD_DIR)
+
+
+def init_assets() -> None:
+    """Load the prebuilt manifest; build it when missing or in local dev."""
+    if settings.ENV in ("production", "prod") and manifest.load():
+        return
+    manifest.build()
+
+
+def asset_url(logical: str) -> str:
+    """Template helper: "css/style.css" -> "/static/css/style.1a2b3c4d5e.css"."""
+    return manifest.url(logical)
+
+
+# -----------------------------
+# Serving
+# -----------------------------
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+class AssetStaticFiles(StaticFiles):
+    """
+    StaticFiles that answers fingerprinted URLs from the manifest (no
+    filesystem lookups) and falls back to normal serving for the rest.
+    """
+
+    def __init__(self, *, manifest: AssetManifest, **kwargs):
+        super().__init__(**kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope) -> Response:
+        asset: Optional[Asset] = self.manifest.by_fingerprint.get(path.replace(os.sep, "/"))
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        headers = {
+            "Cache-Control": IMMUTABLE,
+            "ETag": asset.etag,
+            "Vary": "Accept-Encoding",
+        }
+
+        if request_headers.get("if-none-match") == asset.etag:
+            return Response(status_code=304, headers=headers)
+
+        file_path, stat = asset.path, asset.stat
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in asset.encodings:
+                file_path, stat = asset.encodings[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+
+        return FileResponse(file_path, stat_result=stat, media_type=asset.media_type, headers=headers)
+
+
+if __name__ == "__main__":
+    count = manifest.build()
+    print(f"Fingerprinted {count} static files into {manifest.manifest_path}")
@@ -1,24 +1,46 @@
 # app/auth.py
 from fastapi import Request, HTTPException
 from fastapi.responses import RedirectResponse
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlalchemy.future import select
-from passlib.context import CryptContext
 from .models import User
 from .database import AsyncSessionLocal, get_db
+from .cache import TTLCache
+from .hashing import hasher, hash_password_sync, verify_password_sync
+from .settings import settings
 import uuid
 from typing import Optional
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Detached User rows keyed on user_id. Entries are dropped when a
+# transaction that updated or deleted the user row commits (see the
+# Session events below): dropping them at flush would let a request
+# that reads between flush and commit cache the old row again.
+# Other replicas never see the invalidation; their copy is at most
+# USER_CACHE_TTL_SECONDS stale (e.g. a deactivated user stays logged in
+# there that long).
+_user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
 
 # -----------------------------
 # Password utilities
 # -----------------------------
+# Blocking versions, for scripts only. Request handlers must use the
+# async ones, which run bcrypt in the hashing process pool.
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hash_password_sync(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_password_sync(plain_password, hashed_password)
+
+async def hash_password(password: str) -> str:
+    return await hasher.hash(password)
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await hasher.verify(plain_password, hashed_password)
 
 
 # -----------------------------
@@ -29,7 +51,7 @@ async def authenticate_user(email: str, password: str, db: AsyncSession):
     user = q.scalar_one_or_none()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await check_password(password, user.hashed_password):
         return None
     return user
 
@@ -44,7 +66,8 @@ async def login_user(request: Request, email: str, password: str, db: AsyncSessi
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    # Save user id into session (starlette session)
+    # Save user id into the server-side session, under a fresh id
+    request.session.regenerate()
     request.session["user_id"] = user.id
 
     # optional: create additional session cookie/token if you want
@@ -72,7 +95,8 @@ async def login_user(request: Request, email: str, password: str, db: AsyncSessi
 # Logout
 # -----------------------------
 async def logout_user(request: Request):
-    # clears entire session for this client
+    # clears entire session for this client; the id is deleted from the
+    # session store, so the cookie is useless from now on
     request.session.clear()
     return RedirectResponse("/", status_code=303)
 
@@ -87,13 +111,48 @@ async def get_current_user_from_session(request: Request) -> Optional[User]:
     if not user_id:
         return None
 
-    async with AsyncSessionLocal() as db:
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
+    user = _user_cache.get(user_id)
+    if user is None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(User).where(User.id == user_id))
+            user = result.scalar_one_or_none()
+
+        if user is None:
+            return None
+        _user_cache.set(user_id, user)
+
+    # Deactivated accounts are treated as logged out
+    if user.is_active is False:
+        return None
 
     return user
 
 
+# -----------------------------
+# User cache invalidation
+# -----------------------------
+def invalidate_user(user_id: int) -> None:
+    _user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault("changed_user_ids", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_cached_users(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _keep_cached_users(session):
+    session.info.pop("changed_user_ids", None)
+
+
 
 # -----------------------------
 # Backwards-compatible helper
@@ -103,5 +162,13 @@ async def get_current_user(request: Request) -> Optional[User]:
     """
     Public helper that returns the logged-in user (or None).
     Kept separate so callers import `get_current_user` from here.
+
+    The user is resolved at most once per request: the `attach_user`
+    middleware stores it on `request.state` and routes reuse it.
     """
-    return await get_current_user_from_session(request)
+    if hasattr(request.state, "user"):
+        return request.state.user
+
+    user = await get_current_user_from_session(request)
+    request.state.user = user
+    return user
@@ -0,0 +1,195 @@
+# app/catalog.py
+# -------------------------------------------------------
+# In-process catalog snapshot.
+#
+# The course table is small and read on almost every page, so it is
+# loaded once into an immutable snapshot and served from memory.
+# Every committed Course change bumps `catalog.version`; a single
+# background task then rebuilds the snapshot while readers keep
+# getting the previous one. Changes committed by other processes are
+# picked up by the CATALOG_MAX_AGE_SECONDS refresh, which bumps the
+# version too when the courses differ, so fragments keyed on it
+# (templating.py) are re-rendered. Snapshots are swapped by reference, so a
+# reader always sees one complete version.
+# -------------------------------------------------------
+
+import asyncio
+import contextvars
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .database import AsyncSessionLocal
+from .images import thumbnail_url, thumbnail_srcset
+from .models import Course
+from .settings import settings
+
+
+@dataclass(frozen=True)
+class CourseView:
+    id: int
+    title: str
+    description: Optional[str]
+    thumbnail_path: Optional[str]
+    thumbnail_variants: Optional[tuple]     # ((width, url), ...)
+    price_cents: int
+    is_published: bool
+
+    @property
+    def thumbnail_url(self):
+        return thumbnail_url(self.thumbnail_path)
+
+    @property
+    def thumbnail_srcset(self):
+        return thumbnail_srcset(self.thumbnail_path, self.thumbnail_variants)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    courses: tuple                      # every course, ordered by id
+    published: tuple                    # published courses, ordered by id
+    by_id: Mapping[int, CourseView] = field(repr=False)
+    built_at: float = 0.0
+    course_ids: tuple = field(default=(), repr=False)
+    published_ids: tuple = field(default=(), repr=False)
+
+    def page(self, after_id: Optional[int], limit: int, filters) -> list:
+        """
+        Keyset page: up to `limit + 1` courses with id > after_id that
+        match `filters` (the extra row tells the caller there is more).
+        """
+        if filters.published:
+            rows, ids = self.published, self.published_ids
+        else:
+            rows, ids = self.courses, self.course_ids
+
+        start = bisect_right(ids, after_id) if after_id is not None else 0
+
+        found = []
+        for i in range(start, len(rows)):
+            if filters.matches(rows[i]):
+                found.append(rows[i])
+                if len(found) > limit:
+                    break
+        return found
+
+
+class Catalog:
+    def __init__(self, session_factory, max_age: float):
+        self._session_factory = session_factory
+        self._max_age = max_age
+        self._version = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    async def get(self) -> CatalogSnapshot:
+        """
+        Return the current snapshot. Only the very first call waits for
+        a build; afterwards a stale snapshot is returned immediately and
+        refreshed in the background.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._schedule_rebuild()
+            await asyncio.shield(self._rebuild_task)
+            return self._snapshot
+
+        if snapshot.version < self._version or time.monotonic() - snapshot.built_at > self._max_age:
+            self._schedule_rebuild()
+
+        return snapshot
+
+    def bump(self) -> None:
+        """Mark the catalog as changed and rebuild it in the background."""
+        self._version += 1
+        self._schedule_rebuild()
+
+    def _schedule_rebuild(self) -> None:
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            return  # single-flight: the running task picks up newer versions
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop (e.g. a CLI script); the next reader rebuilds
+
+        # A fresh context: the task outlives the request that happened to
+        # start it, and its queries must not count towards that request's
+        # stats or budget (querystats.py)
+        self._rebuild_task = loop.create_task(self._rebuild(), context=contextvars.Context())
+
+    async def _rebuild(self) -> None:
+        while True:
+            target = self._version
+
+            async with self._session_factory() as session:
+                result = await session.execute(select(Course).order_by(Course.id))
+                rows = result.scalars().all()
+
+            courses = tuple(
+                CourseView(
+                    id=c.id,
+                    title=c.title,
+                    description=c.description,
+                    thumbnail_path=c.thumbnail_path,
+                    thumbnail_variants=tuple(sorted(c.thumbnail_variants.items())) if c.thumbnail_variants else None,
+                    price_cents=c.price_cents or 0,
+                    is_published=bool(c.is_published),
+                )
+                for c in rows
+            )
+
+            previous = self._snapshot
+            if previous is not None and courses != previous.courses and self._version == target == previous.version:
+                # Changed by another process (max-age refresh)
+                self._version += 1
+                target = self._version
+
+            published = tuple(c for c in courses if c.is_published)
+            self._snapshot = CatalogSnapshot(
+                version=target,
+                courses=courses,
+                published=published,
+                by_id=MappingProxyType({c.id: c for c in courses}),
+                built_at=time.monotonic(),
+                course_ids=tuple(c.id for c in courses),
+                published_ids=tuple(c.id for c in published),
+            )
+
+            if self._version == target:
+                return
+
+
+catalog = Catalog(AsyncSessionLocal, max_age=settings.CATALOG_MAX_AGE_SECONDS)
+
+
+# -------------------------------------------------------
+# Bump the version whenever a Course change is committed
+# -------------------------------------------------------
+@event.listens_for(Session, "after_flush")
+def _track_course_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Course):
+            session.info["catalog_dirty"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_catalog_version(session):
+    if session.info.pop("catalog_dirty", False):
+        catalog.bump()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_course_changes(session):
+    session.info.pop("catalog_dirty", None)
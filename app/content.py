@@ -0,0 +1,360 @@
+# app/content.py
+# -------------------------------------------------------
+# Lesson content, processed when it is written rather than per view.
+#
+# Whenever a Lesson's content or video_url changes (ORM flush, or the
+# bulk importer), we store:
+#   content_html     the body rendered from Markdown to HTML. Everything
+#                    is escaped first and only the tags below are added,
+#                    so the output is safe to mark |safe in templates.
+#   content_hash     sha256 of the source body plus RENDERER_VERSION
+#   video_embed_id   the YouTube id parsed out of video_url
+#
+# New lessons are appended to their course (position = last + 1).
+#
+# Views read a LessonBody from a bounded LRU keyed on the lesson id, so a
+# hot lesson is a dict lookup: no query, no regex, no rendering. The one
+# query on a miss also finds the previous / next lesson (LAG / LEAD over
+# the course order), which views send as a prefetch hint. Misses are
+# read from the primary, so replica lag can't pin an old body.
+#
+#   python -m app.content   # (re)render lessons written before this, or
+#                           # after a RENDERER_VERSION bump
+# -------------------------------------------------------
+
+import asyncio
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from markupsafe import escape
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from .cache import TTLCache
+from .database import primary_session
+from .models import Course, Lesson
+from .settings import settings
+
+# Bump when the renderer's output changes; `python -m app.content`
+# then re-renders every lesson
+RENDERER_VERSION = "2"
+
+
+# -------------------------------------------------------
+# Video ids
+# -------------------------------------------------------
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{6,64}$")
+_VIDEO_URL_RES = (
+    re.compile(r"[?&]v=([A-Za-z0-9_-]{6,64})"),                         # youtube.com/watch?v=ID
+    re.compile(r"youtu\.be/([A-Za-z0-9_-]{6,64})"),                     # youtu.be/ID
+    re.compile(r"/(?:embed|shorts|live)/([A-Za-z0-9_-]{6,64})"),        # youtube.com/embed/ID
+)
+
+
+def extract_video_id(video_url: Optional[str]) -> Optional[str]:
+    """YouTube id from a URL, or the value itself if it already is an id."""
+    if not video_url:
+        return None
+    video_url = video_url.strip()
+    if _VIDEO_ID_RE.match(video_url):
+        return video_url
+    for pattern in _VIDEO_URL_RES:
+        match = pattern.search(video_url)
+        if match:
+            return match.group(1)
+    return None
+
+
+# -------------------------------------------------------
+# Markdown subset -> HTML
+#   # / ## / ###  headings (h2-h4; the page title is the h1)
+#   - item, 1. item, ``` fenced code ```, blank-line paragraphs
+#   **bold**, *italic*, `code`, [text](https://... or /path)
+# -------------------------------------------------------
+_HEADING_RE = re.compile(r"^(#{1,3})\s+(.*)$")
+_UL_RE = re.compile(r"^\s*[-*]\s+(.*)$")
+_OL_RE = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+_CODE_SPAN_RE = re.compile(r"(`[^`\n]+`)")
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC_RE = re.compile(r"\*([^*\s][^*]*?)\*")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+_LINK_TOKEN_RE = re.compile(r"\0(\d+)\0")
+_SAFE_URL_RE = re.compile(r"^(?:https?://|mailto:|/(?!/)|#)", re.IGNORECASE)
+
+
+def _emphasis(text: str) -> str:
+    text = _BOLD_RE.sub(r"<strong>\1</strong>", text)
+    return _ITALIC_RE.sub(r"<em>\1</em>", text)
+
+
+def _inline(text: str) -> str:
+    """Escape, then apply inline markup (never inside code spans or URLs)."""
+    parts = _CODE_SPAN_RE.split(str(escape(text.replace("\0", ""))))
+    for i, part in enumerate(parts):
+        if i % 2:
+            parts[i] = f"<code>{part[1:-1]}</code>"
+            continue
+        # Links become \0n\0 tokens, like code spans, so emphasis never
+        # rewrites an href but can still wrap a whole link
+        links = []
+
+        def hold(match):
+            text, url = match.group(1), match.group(2)
+            if not _SAFE_URL_RE.match(url):
+                return match.group(0)   # left as plain text
+            links.append(f'<a href="{url}" rel="nofollow noopener">{_emphasis(text)}</a>')
+            return f"\0{len(links) - 1}\0"
+
+        part = _emphasis(_LINK_RE.sub(hold, part))
+        parts[i] = _LINK_TOKEN_RE.sub(lambda m: links[int(m.group(1))], part)
+    return "".join(parts)
+
+
+def render_content(text: Optional[str]) -> str:
+    if not text:
+        return ""
+
+    out = []
+    paragraph = []
+    list_tag = None
+    code = None
+
+    def close_paragraph():
+        if paragraph:
+            out.append("<p>" + "<br>\n".join(_inline(l) for l in paragraph) + "</p>")
+            paragraph.clear()
+
+    def close_list():
+        nonlocal list_tag
+        if list_tag:
+            out.append(f"</{list_tag}>")
+            list_tag = None
+
+    for line in text.replace("\r\n", "\n").split("\n"):
+        if code is not None:
+            if line.strip().startswith("```"):
+                out.append("<pre><code>" + str(escape("\n".join(code))) + "</code></pre>")
+                code = None
+            else:
+                code.append(line)
+            continue
+
+        if line.strip().startswith("```"):
+            close_paragraph()
+            close_list()
+            code = []
+            continue
+
+        if not line.strip():
+            close_paragraph()
+            close_list()
+            continue
+
+        heading = _HEADING_RE.match(line)
+        item = _UL_RE.match(line) or _OL_RE.match(line)
+        if heading:
+            close_paragraph()
+            close_list()
+            level = len(heading.group(1)) + 1
+            out.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif item:
+            close_paragraph()
+            tag = "ul" if _UL_RE.match(line) else "ol"
+            if list_tag != tag:
+                close_list()
+                out.append(f"<{tag}>")
+                list_tag = tag
+            out.append(f"<li>{_inline(item.group(1))}</li>")
+        else:
+            close_list()
+            paragraph.append(line.strip())
+
+    if code is not None:   # unterminated fence
+        out.append("<pre><code>" + str(escape("\n".join(code))) + "</code></pre>")
+    close_paragraph()
+    close_list()
+    return "\n".join(out)
+
+
+def content_hash(text: Optional[str]) -> str:
+    return hashlib.sha256(f"{RENDERER_VERSION}\0{text or ''}".encode("utf-8")).hexdigest()
+
+
+def rendered_fields(content=..., video_url=...) -> dict:
+    """The derived columns for whichever source columns are given."""
+    fields = {}
+    if content is not ...:
+        fields["content_html"] = render_content(content)
+        fields["content_hash"] = content_hash(content)
+    if video_url is not ...:
+        fields["video_embed_id"] = extract_video_id(video_url)
+    return fields
+
+
+@event.listens_for(Lesson, "before_insert")
+@event.listens_for(Lesson, "before_update")
+def _render_on_write(mapper, connection, target):
+    if target.content_hash != content_hash(target.content):
+        target.content_html = render_content(target.content)
+        target.content_hash = content_hash(target.content)
+    target.video_embed_id = extract_video_id(target.video_url)
+
+
+# -------------------------------------------------------
+# Position of new lessons
+# -------------------------------------------------------
+@event.listens_for(Session, "before_flush")
+def _append_new_lessons(session, flush_context, instances):
+    # Lesson -> its course id, or the Course itself while that is new too
+    new = {}
+    for obj in session.new:
+        if isinstance(obj, Lesson) and obj.position is None:
+            course = obj.course_id if obj.course_id is not None else obj.course
+            if course is not None:
+                new[obj] = course.id if isinstance(course, Course) and course.id is not None else course
+            # Neither set: no course to append to, position stays unset
+    if not new:
+        return
+    existing = {c for c in new.values() if isinstance(c, int)}
+    last = {}
+    if existing:
+        with session.no_autoflush:
+            last = dict(session.execute(
+                select(Lesson.course_id, func.max(Lesson.position))
+                .where(Lesson.course_id.in_(existing))
+                .group_by(Lesson.course_id)
+            ).all())
+    for obj, course in new.items():
+        last[course] = obj.position = (last.get(course) or 0) + 1
+
+
+# -------------------------------------------------------
+# Rendered lesson cache
+# -------------------------------------------------------
+@dataclass(frozen=True)
+class LessonBody:
+    id: int
+    course_id: int
+    position: int
+    title: str
+    content_html: str
+    video_embed_id: Optional[str]
+    content_hash: str
+    prev_id: Optional[int] = None
+    next_id: Optional[int] = None
+
+    def prefetch_header(self) -> Optional[str]:
+        """`Link` value that has the browser fetch the next lesson early."""
+        if self.next_id is None:
+            return None
+        return f"</lesson/{self.next_id}>; rel=prefetch"
+
+
+_lesson_cache = TTLCache(
+    maxsize=settings.LESSON_CACHE_MAX_ENTRIES,
+    ttl=settings.LESSON_CACHE_TTL_SECONDS,
+)
+
+
+async def get_lesson_body(db: AsyncSession, lesson_id: int) -> Optional[LessonBody]:
+    body = _lesson_cache.get(lesson_id)
+    if body is not None:
+        return body
+
+    # Neighbours over this lesson's course only (ix_lessons_course_position),
+    # joined back to the one row whose body we need
+    this = aliased(Lesson)
+    order = (Lesson.position, Lesson.id)
+    neighbours = (
+        select(
+            Lesson.id,
+            func.lag(Lesson.id).over(order_by=order).label("prev_id"),
+            func.lead(Lesson.id).over(order_by=order).label("next_id"),
+        )
+        .where(Lesson.course_id == select(this.course_id).where(this.id == lesson_id).scalar_subquery())
+        .subquery()
+    )
+    # Filled from the primary only, never a lagging replica (primary_session)
+    async with primary_session(db) as primary:
+        row = (await primary.execute(
+            select(Lesson.id, Lesson.course_id, Lesson.position, Lesson.title, Lesson.content_html,
+                   Lesson.video_embed_id, Lesson.content_hash, neighbours.c.prev_id, neighbours.c.next_id)
+            .join(neighbours, neighbours.c.id == Lesson.id)
+            .where(Lesson.id == lesson_id)
+        )).one_or_none()
+        if row is None:
+            return None
+
+        if row.content_hash is None:
+            # Written around the ORM and not backfilled yet: render now (the
+            # cached copy saves doing it again), python -m app.content persists it
+            source = (await primary.execute(
+                select(Lesson.content, Lesson.video_url).where(Lesson.id == lesson_id)
+            )).one()
+            fields = rendered_fields(source.content, source.video_url)
+        else:
+            fields = {"content_html": row.content_html or "", "content_hash": row.content_hash,
+                      "video_embed_id": row.video_embed_id}
+    body = LessonBody(row.id, row.course_id, row.position, row.title,
+                      prev_id=row.prev_id, next_id=row.next_id, **fields)
+
+    _lesson_cache.set(lesson_id, body)
+    return body
+
+
+def invalidate_lesson(lesson_id: int) -> None:
+    _lesson_cache.invalidate(lesson_id)
+
+
+@event.listens_for(Lesson, "after_update")
+def _drop_cached_lesson(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.position.history.has_changes() or state.attrs.course_id.history.has_changes():
+        # Reordered: other lessons' prev / next changed too
+        _lesson_cache.clear()
+    else:
+        invalidate_lesson(target.id)
+
+
+@event.listens_for(Lesson, "after_insert")
+@event.listens_for(Lesson, "after_delete")
+def _drop_cached_lessons(mapper, connection, target):
+    _lesson_cache.clear()
+
+
+# -------------------------------------------------------
+# Backfill / re-render
+# -------------------------------------------------------
+async def rerender_lessons(batch_size: int = 500) -> int:
+    """Render lessons whose stored html is missing or from an older renderer."""
+    from .database import AsyncSessionLocal
+
+    changed = 0
+    last_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            rows = (await db.execute(
+                select(Lesson.id, Lesson.content, Lesson.video_url, Lesson.content_hash)
+                .where(Lesson.id > last_id).order_by(Lesson.id).limit(batch_size)
+            )).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            stale = [
+                {"id": r.id, **rendered_fields(r.content, r.video_url)}
+                for r in rows if r.content_hash != content_hash(r.content)
+            ]
+            if stale:
+                # ORM bulk UPDATE by primary key: one executemany per batch
+                await db.execute(update(Lesson), stale)
+                await db.commit()
+                changed += len(stale)
+    return changed
+
+
+if __name__ == "__main__":
+    print(f"Rendered {asyncio.run(rerender_lessons())} lessons")
@@ -1,14 +1,17 @@
-from sqlalchemy import select
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
 from . import models
-from .auth import get_password_hash, verify_password
+from .auth import hash_password, check_password
+from .catalog import catalog
+from .pagination import CourseFilters, PageParams, next_cursor
 
 async def get_user_by_email(db: AsyncSession, email: str):
     q = await db.execute(select(models.User).where(models.User.email == email))
     return q.scalars().first()
 
 async def create_user(db: AsyncSession, email: str, password: str):
-    hashed = get_password_hash(password)
+    hashed = await hash_password(password)
     user = models.User(email=email, hashed_password=hashed)
     db.add(user)
     await db.commit()
@@ -19,13 +22,40 @@ async def authenticate_user(db: AsyncSession, email: str, password: str):
     user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await check_password(password, user.hashed_password):
         return None
     return user
 
-async def list_courses(db: AsyncSession):
-    q = await db.execute(select(models.Course).where(models.Course.is_published==True))
-    return q.scalars().all()
+async def list_courses(db: AsyncSession = None):
+    # Served from the in-process catalog snapshot; `db` is kept for callers
+    snapshot = await catalog.get()
+    return snapshot.published
+
+async def list_courses_page(params: PageParams, filters: CourseFilters, snapshot=None):
+    """Returns (courses, next_cursor) from the (given or current) catalog snapshot."""
+    snapshot = snapshot or await catalog.get()
+    rows = snapshot.page(params.after_id, params.limit, filters)
+    return rows[:params.limit], next_cursor(rows, params.limit)
+
+async def list_lesson_outline(db: AsyncSession, course_id: int, params: PageParams):
+    """
+    Returns (rows, next_cursor) for one course in lesson order. Rows are
+    (id, title, position) only: lesson lists never need the body or
+    video, which stay in the database until lesson_view loads one lesson.
+    """
+    L = models.Lesson
+    stmt = select(L.id, L.title, L.position).where(L.course_id == course_id)
+    if params.after_id is not None:
+        # Keyset on (position, id), resuming after the cursor's lesson
+        after = aliased(L)
+        after_position = select(after.position).where(after.id == params.after_id).scalar_subquery()
+        stmt = stmt.where(or_(
+            L.position > after_position,
+            and_(L.position == after_position, L.id > params.after_id),
+        ))
+    q = await db.execute(stmt.order_by(L.position, L.id).limit(params.limit + 1))
+    rows = q.all()
+    return rows[:params.limit], next_cursor(rows, params.limit)
 
 async def get_course(db: AsyncSession, course_id: int):
     q = await db.execute(select(models.Course).where(models.Course.id==course_id))
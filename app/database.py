@@ -1,7 +1,13 @@
 # app/database.py
+from fastapi import Request
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from app.metrics import acquire_connection
 from app.settings import settings
+import asyncio
+import time
+from contextlib import asynccontextmanager
 import urllib.parse
 
 Base = declarative_base()
@@ -9,13 +15,13 @@ Base = declarative_base()
 # ----------------------------------------------------------
 # SELECT DATABASE BASED ON ENVIRONMENT
 # ----------------------------------------------------------
-def build_azure_sql_url():
+def build_azure_sql_url(raw: str = None):
     """
     Convert standard AZURE_SQL_CONNECTION_STRING into a valid
     SQLAlchemy async connection string using aioodbc.
     """
 
-    raw = settings.AZURE_SQL_CONNECTION_STRING
+    raw = raw or settings.AZURE_SQL_CONNECTION_STRING
     if not raw:
         return None
 
@@ -68,17 +74,100 @@ else:
     print("Using local SQLite")
     DATABASE_URL = settings.DATABASE_URL
 
+# Optional read replica (e.g. Azure SQL read scale-out: the same server
+# with ApplicationIntent=ReadOnly). Either form of URL is accepted.
+DATABASE_READ_URL = None
+if settings.DATABASE_READ_URL:
+    print("Using read replica for read-only routes")
+    DATABASE_READ_URL = (
+        settings.DATABASE_READ_URL
+        if "://" in settings.DATABASE_READ_URL
+        else build_azure_sql_url(settings.DATABASE_READ_URL)
+    )
+
 
 # ----------------------------------------------------------
 # SQLALCHEMY ENGINE (ASYNC)
 # ----------------------------------------------------------
+def engine_options(url: str) -> dict:
+    """
+    Pool settings for a server database. Connections are recycled before
+    Azure SQL's 30 minute idle timeout drops them, and instead of a
+    pre-ping round trip on every checkout, a connection that turns out
+    to be dead invalidates the pool (SQLAlchemy's optimistic disconnect
+    handling), so only the request that hit it fails.
+
+    SQLite keeps SQLAlchemy's default pool: connecting is a file open.
+    """
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
-    pool_pre_ping=True,
     future=True,
+    **engine_options(DATABASE_URL),
 )
 
+
+if DATABASE_READ_URL:
+    read_engine = create_async_engine(
+        DATABASE_READ_URL,
+        echo=False,
+        future=True,
+        **engine_options(DATABASE_READ_URL),
+    )
+else:
+    read_engine = engine
+
+
+def _log_disconnect(context):
+    if context.is_disconnect:
+        print("DB DISCONNECT: pool invalidated:", context.original_exception)
+
+
+for _engine in {engine, read_engine}:
+    event.listen(_engine.sync_engine, "handle_error", _log_disconnect)
+
+
+async def warm_pool(count: int = None, bind=None) -> int:
+    """
+    Open `count` connections at startup (default: the pool size) so the
+    first requests don't pay for TLS and login. Returns how many opened.
+    """
+    bind = bind or engine
+    if bind.dialect.name == "sqlite":
+        # Opening a file costs nothing worth warming, and depending on the
+        # SQLAlchemy version aiosqlite uses NullPool or a queue pool, so
+        # don't open DB_POOL_SIZE connections locally either way
+        return 0
+    pool = bind.sync_engine.pool
+    if not hasattr(pool, "size"):
+        return 0    # pool without a size (NullPool / StaticPool): nothing to keep open
+
+    if count is None:
+        count = settings.DB_POOL_WARMUP if settings.DB_POOL_WARMUP is not None else pool.size()
+    count = min(count, pool.size())
+    if count <= 0:
+        return 0
+
+    conns = await asyncio.gather(*(bind.connect() for _ in range(count)))
+    try:
+        for conn in conns:
+            await conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in conns:
+            await conn.close()    # back to the pool, still open
+    return count
+
 AsyncSessionLocal = sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -87,6 +176,93 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
-async def get_db():
+ReadSessionLocal = sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# ----------------------------------------------------------
+# READ-YOUR-WRITES
+# ----------------------------------------------------------
+# A session that commits changes marks the user's (cookie) session, and
+# for DB_READ_STICKY_SECONDS afterwards get_read_db hands that user the
+# primary, so e.g. a new purchase shows on /dashboard straight away
+# despite replica lag.
+WRITE_MARK_KEY = "db_write_at"
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["db_pending_write"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["db_pending_write"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _note_commit(session):
+    if session.info.pop("db_pending_write", False):
+        session.info["db_wrote"] = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session):
+    session.info.pop("db_pending_write", None)
+
+
+def _mark_write(request: Request, session: AsyncSession) -> None:
+    # Only needed with a replica; otherwise it would write the session
+    # store after every write
+    if read_engine is engine:
+        return
+    if session.info.get("db_wrote") and "session" in request.scope:
+        request.session[WRITE_MARK_KEY] = int(time.time())
+
+
+def reads_from_primary(request: Request) -> bool:
+    if read_engine is engine:
+        return True
+    if "session" not in request.scope:
+        return False
+    wrote_at = request.session.get(WRITE_MARK_KEY)
+    return wrote_at is not None and time.time() - wrote_at < settings.DB_READ_STICKY_SECONDS
+
+
+async def get_db(request: Request):
+    """Primary database; use for any handler that writes."""
+    async with AsyncSessionLocal() as session:
+        await acquire_connection(session)
+        yield session
+        _mark_write(request, session)
+
+
+async def get_read_db(request: Request):
+    """
+    Read replica when one is configured, for read-only handlers. Falls
+    back to the primary for a user who wrote in the last few seconds.
+    """
+    factory = AsyncSessionLocal if reads_from_primary(request) else ReadSessionLocal
+    async with factory() as session:
+        await acquire_connection(session)
+        yield session
+
+
+@asynccontextmanager
+async def primary_session(db: AsyncSession):
+    """
+    `db` itself if it is on the primary, else a short-lived primary
+    session. Process-wide caches fill through this: an answer read from
+    a lagging replica would otherwise be served for the cache's whole TTL.
+    """
+    if db.bind is engine:
+        yield db
+        return
     async with AsyncSessionLocal() as session:
         yield session
@@ -0,0 +1,239 @@
+# app/enrollments.py
+# -------------------------------------------------------
+# Bulk enrollment: grant course access to many users at once.
+#
+# Input is a stream of (email, course_id) pairs. They are handled in
+# batches of ENROLLMENT_BATCH_SIZE, and each batch costs a fixed number
+# of statements however many rows it has:
+#   1. users resolved by email         (one SELECT ... IN)
+#   2. unknown course ids looked up    (one SELECT ... IN, cached per run)
+#   3. existing paid purchases found   (one SELECT ... IN)
+#   4. the new purchases inserted      (one executemany INSERT; retried
+#      if a concurrent purchase trips the unique index)
+# then committed. Entitlement caches are invalidated once per affected
+# user when the run ends, not once per row.
+# -------------------------------------------------------
+
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .entitlements import invalidate_entitlements
+from .models import Course, Purchase, User
+from .settings import settings
+
+# Problems listed in the report, per kind; the counts are always complete
+MAX_REPORTED = 100
+
+Pair = Tuple[str, int]
+
+
+class EnrollmentInputError(ValueError):
+    pass
+
+
+@dataclass
+class EnrollmentReport:
+    rows: int = 0
+    enrolled: int = 0
+    already_enrolled: int = 0
+    duplicates: int = 0
+    users_affected: int = 0
+    unknown_users: List[str] = field(default_factory=list)
+    unknown_courses: List[int] = field(default_factory=list)
+    invalid_rows: List[dict] = field(default_factory=list)
+    unknown_user_count: int = 0
+    unknown_course_count: int = 0
+    invalid_row_count: int = 0
+
+    def add_unknown_user(self, email: str) -> None:
+        self.unknown_user_count += 1
+        if len(self.unknown_users) < MAX_REPORTED:
+            self.unknown_users.append(email)
+
+    def add_unknown_course(self, course_id: int) -> None:
+        self.unknown_course_count += 1
+        if len(self.unknown_courses) < MAX_REPORTED:
+            self.unknown_courses.append(course_id)
+
+    def add_invalid(self, line: int, error: str) -> None:
+        self.invalid_row_count += 1
+        if len(self.invalid_rows) < MAX_REPORTED:
+            self.invalid_rows.append({"line": line, "error": error})
+
+
+# -------------------------------------------------------
+# Parsing (NDJSON or CSV, one line at a time)
+# -------------------------------------------------------
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+def _pairs_from_record(email, course_ids) -> List[Pair]:
+    email = email.strip() if isinstance(email, str) else None
+    if not email:
+        raise EnrollmentInputError("missing email")
+    if not isinstance(course_ids, list):
+        course_ids = [course_ids]
+    try:
+        return [(email, int(c)) for c in course_ids]
+    except (TypeError, ValueError):
+        raise EnrollmentInputError(f"bad course id in {course_ids!r}")
+
+
+async def iter_enrollments(
+    lines: AsyncIterator[str], fmt: str, report: EnrollmentReport
+) -> AsyncIterator[Pair]:
+    """
+    Yield (email, course_id) pairs.
+
+    ndjson: {"email": ..., "course_id": 3} or {"email": ..., "course_ids": [3, 4]}
+    csv:    a header with `email` and `course_id` columns
+    """
+    header = None
+    n = 0
+    async for line in lines:
+        n += 1
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [h.strip().lower() for h in next(csv.reader([line]))]
+            if "email" not in header or "course_id" not in header:
+                raise EnrollmentInputError("CSV header needs email and course_id columns")
+            continue
+        try:
+            if fmt == "csv":
+                row = dict(zip(header, next(csv.reader([line]))))
+                pairs = _pairs_from_record(row.get("email"), row.get("course_id"))
+            else:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    raise EnrollmentInputError("invalid JSON")
+                if not isinstance(row, dict):
+                    raise EnrollmentInputError("expected a JSON object")
+                pairs = _pairs_from_record(
+                    row.get("email"), row.get("course_ids", row.get("course_id"))
+                )
+        except EnrollmentInputError as e:
+            report.add_invalid(n, str(e))
+            continue
+
+        for pair in pairs:
+            report.rows += 1
+            yield pair
+
+
+# -------------------------------------------------------
+# Writes
+# -------------------------------------------------------
+async def _enroll_batch(
+    db: AsyncSession,
+    batch: Iterable[Pair],
+    report: EnrollmentReport,
+    known_courses: Set[int],
+    missing_courses: Set[int],
+    affected: Set[int],
+) -> None:
+    pairs = set()
+    for pair in batch:
+        if pair in pairs:
+            report.duplicates += 1
+        pairs.add(pair)
+
+    # 1. users by email
+    emails = {email for email, _ in pairs}
+    user_ids = dict((await db.execute(
+        select(User.email, User.id).where(User.email.in_(emails))
+    )).all())
+    for email in sorted(emails - user_ids.keys()):
+        report.add_unknown_user(email)
+
+    # 2. courses not seen in an earlier batch
+    course_ids = {course_id for _, course_id in pairs}
+    unseen = course_ids - known_courses - missing_courses
+    if unseen:
+        found = set((await db.execute(select(Course.id).where(Course.id.in_(unseen)))).scalars())
+        known_courses |= found
+        for course_id in sorted(unseen - found):
+            missing_courses.add(course_id)
+            report.add_unknown_course(course_id)
+
+    wanted = {
+        (user_ids[email], course_id)
+        for email, course_id in pairs
+        if email in user_ids and course_id in known_courses
+    }
+    if not wanted:
+        return
+
+    # 3. drop what is already paid for (a superset is fetched, then matched)
+    # 4. one executemany INSERT, committed per batch. A purchase made
+    #    meanwhile trips uq_purchases_user_course_paid; look again and retry.
+    for attempt in range(3):
+        existing = {tuple(row) for row in (await db.execute(
+            select(Purchase.user_id, Purchase.course_id).where(
+                Purchase.user_id.in_({u for u, _ in wanted}),
+                Purchase.course_id.in_({c for _, c in wanted}),
+                Purchase.paid == True,
+            )
+        ))}
+        new = wanted - existing
+        if not new:
+            break
+        try:
+            await db.execute(
+                insert(Purchase),
+                [{"user_id": u, "course_id": c, "paid": True} for u, c in sorted(new)],
+            )
+            await db.commit()
+            break
+        except IntegrityError:
+            await db.rollback()
+            if attempt == 2:
+                raise
+
+    report.already_enrolled += len(wanted) - len(new)
+    report.enrolled += len(new)
+    affected.update(u for u, _ in new)
+
+
+async def enroll_many(
+    db: AsyncSession, pairs: AsyncIterator[Pair], report: EnrollmentReport,
+    batch_size: Optional[int] = None,
+) -> EnrollmentReport:
+    batch_size = batch_size or settings.ENROLLMENT_BATCH_SIZE
+    known_courses: Set[int] = set()
+    missing_courses: Set[int] = set()
+    affected: Set[int] = set()
+
+    try:
+        batch = []
+        async for pair in pairs:
+            batch.append(pair)
+            if len(batch) >= batch_size:
+                await _enroll_batch(db, batch, report, known_courses, missing_courses, affected)
+                batch = []
+        if batch:
+            await _enroll_batch(db, batch, report, known_courses, missing_courses, affected)
+    finally:
+        # Batches are committed one by one, so even a failed run may
+        # have granted access to some users
+        for user_id in affected:
+            invalidate_entitlements(user_id)
+        report.users_affected = len(affected)
+
+    return report
@@ -0,0 +1,92 @@
+# app/entitlements.py
+# -------------------------------------------------------
+# Which courses does a user own?
+#
+# A user's paid course ids are loaded with one query and kept as a
+# frozenset, so access checks and "owned" badges are set lookups.
+# Call invalidate_entitlements() after committing a Purchase, or use
+# grant_course_access(), which does both.
+#
+# Invalidation only reaches the process that wrote, so only positive
+# answers are trusted from the cache: an empty set is never cached, and
+# a course missing from a cached set is checked against the database
+# before access is refused (the purchase may have happened on another
+# replica). Misses are always read from the primary (primary_session),
+# never from the read replica, so replica lag can't pin a stale set.
+# -------------------------------------------------------
+
+from typing import FrozenSet, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .database import primary_session
+from .models import Purchase
+from .settings import settings
+
+_entitlement_cache = TTLCache(
+    maxsize=settings.ENTITLEMENT_CACHE_MAX_ENTRIES,
+    ttl=settings.ENTITLEMENT_CACHE_TTL_SECONDS,
+)
+
+
+async def _load_owned(db: AsyncSession, user_id: int) -> FrozenSet[int]:
+    async with primary_session(db) as primary:
+        result = await primary.execute(
+            select(Purchase.course_id)
+            .where(Purchase.user_id == user_id, Purchase.paid == True)
+            .distinct()
+        )
+        owned = frozenset(result.scalars().all())
+    if owned:
+        _entitlement_cache.set(user_id, owned)
+    else:
+        _entitlement_cache.invalidate(user_id)
+    return owned
+
+
+async def get_owned_course_ids(db: AsyncSession, user_id: Optional[int]) -> FrozenSet[int]:
+    if not user_id:
+        return frozenset()
+
+    owned = _entitlement_cache.get(user_id)
+    if owned is not None:
+        return owned
+    return await _load_owned(db, user_id)
+
+
+async def has_course_access(db: AsyncSession, user_id: Optional[int], course_id: int) -> bool:
+    if not user_id:
+        return False
+    owned = _entitlement_cache.get(user_id)
+    if owned is not None and course_id in owned:
+        return True
+    # Not cached as owned: ask the database, it may be a new purchase
+    return course_id in await _load_owned(db, user_id)
+
+
+def invalidate_entitlements(user_id: int) -> None:
+    _entitlement_cache.invalidate(user_id)
+
+
+async def grant_course_access(db: AsyncSession, user_id: int, course_id: int) -> bool:
+    """
+    Record a paid purchase unless the user already owns the course.
+    Returns False when nothing was written. Safe against double submits:
+    a concurrent duplicate hits uq_purchases_user_course_paid and is
+    treated as already owned.
+    """
+    if await has_course_access(db, user_id, course_id):
+        return False
+
+    db.add(Purchase(user_id=user_id, course_id=course_id, paid=True))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    finally:
+        invalidate_entitlements(user_id)
+    return True
@@ -0,0 +1,185 @@
+# app/hashing.py
+# -------------------------------------------------------
+# Password hashing off the event loop.
+#
+# bcrypt takes ~250ms of pure CPU per call. Running it inside an async
+# handler freezes every other request on the worker, so hashes and
+# verifications go to a small process pool sized to the pod's CPU
+# limit. The number of outstanding jobs is capped; once the cap is
+# reached callers get a 503 instead of an ever-growing queue.
+# -------------------------------------------------------
+
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from .settings import settings
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# -----------------------------
+# Work functions (run in the pool)
+# -----------------------------
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+# -----------------------------
+# CPU limit detection
+# -----------------------------
+def cpu_limit_cores() -> int:
+    """
+    Number of whole cores this process may use: the cgroup CPU quota
+    when one is set (k8s `resources.limits.cpu`), else the CPU affinity.
+    """
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            raw_quota, raw_period = f.read().split()
+        if raw_quota != "max":
+            quota = int(raw_quota) / int(raw_period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                raw_quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                raw_period = int(f.read())
+            if raw_quota > 0:
+                quota = raw_quota / raw_period
+        except (OSError, ValueError):
+            pass
+
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+
+    if quota is None:
+        return available
+    return max(1, min(available, math.ceil(quota)))
+
+
+# -----------------------------
+# Executor
+# -----------------------------
+class PasswordHasher:
+    """
+    Bounded front-end to a process pool. `workers=0` runs inline on the
+    event loop (the old behaviour, kept for benchmarks and debugging).
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    def start(self) -> None:
+        if self.workers and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: never fork a process that owns an event loop and DB pool
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password_sync, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password_sync, plain_password, hashed_password)
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        started = time.perf_counter()
+
+        if not self.workers:
+            result = fn(*args)
+            self._record(time.perf_counter() - started)
+            return result
+
+        self.start()
+        loop = asyncio.get_running_loop()
+
+        self._pending += 1
+        job = self._executor.submit(fn, *args)
+        # The slot is released when the job really finishes (or is cancelled
+        # before it starts), not when the caller gives up waiting.
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        self._record(time.perf_counter() - started)
+        return result
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    def _record(self, elapsed: float) -> None:
+        self.completed += 1
+        self.latency_total += elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "latency_avg_ms": round(1000 * self.latency_total / self.completed, 2) if self.completed else 0.0,
+            "latency_max_ms": round(1000 * self.latency_max, 2),
+        }
+
+
+hasher = PasswordHasher(
+    workers=cpu_limit_cores() if settings.PASSWORD_HASH_WORKERS is None else settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,126 @@
+# app/idempotency.py
+# -------------------------------------------------------
+# Idempotency keys for POSTs that must not run twice (checkout).
+#
+# A client sends a key with the request: an `Idempotency-Key` header,
+# or an `idempotency_key` hidden field that the form page generates.
+# The first response for (user, path, key) is kept for
+# IDEMPOTENCY_TTL_SECONDS, and a retry or double click gets that same
+# response back without running the handler or touching the database.
+# A retry that arrives while the first request is still running waits
+# for it instead of running in parallel.
+#
+# The store is per process, like the other caches here: the replay
+# without touching the database only holds for a retry that reaches the
+# same pod. A retry routed to another replica runs checkout again; it
+# finds the course already owned (or hits uq_purchases_user_course_paid),
+# so nothing is recorded twice, but it does query the database, and a
+# declined attempt may be retried for real there.
+# -------------------------------------------------------
+
+import asyncio
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from .cache import TTLCache
+from .settings import settings
+
+HEADER = "Idempotency-Key"
+FORM_FIELD = "idempotency_key"
+MAX_KEY_LENGTH = 255
+
+# Per-user and per-response, so never replayed
+_SKIPPED_HEADERS = {"content-length", "set-cookie"}
+
+
+def new_key() -> str:
+    """Key for a form page to embed in its hidden `idempotency_key` field."""
+    return uuid.uuid4().hex
+
+
+async def request_key(request: Request) -> Optional[str]:
+    """The client's idempotency key from the header or the submitted form."""
+    key = request.headers.get(HEADER)
+    if key is None and request.headers.get("content-type", "").startswith(
+        ("application/x-www-form-urlencoded", "multipart/form-data")
+    ):
+        key = (await request.form()).get(FORM_FIELD)
+    if not isinstance(key, str):
+        return None
+    key = key.strip()
+    return key[:MAX_KEY_LENGTH] or None
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status_code: int
+    body: bytes
+    headers: tuple
+
+    @classmethod
+    def from_response(cls, response: Response) -> "StoredResponse":
+        headers = tuple(
+            (k, v) for k, v in response.headers.items() if k.lower() not in _SKIPPED_HEADERS
+        )
+        return cls(response.status_code, bytes(response.body), headers)
+
+    def replay(self) -> Response:
+        response = Response(content=self.body, status_code=self.status_code)
+        for k, v in self.headers:
+            response.headers.append(k, v)
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+
+class IdempotencyStore:
+    def __init__(self, maxsize: int, ttl: float):
+        self._done = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._running: dict = {}
+
+    async def run(self, key: Optional[Hashable], call: Callable[[], Awaitable[Response]]) -> Response:
+        """Run `call` once per key; later calls with the key get its response."""
+        if key is None:
+            return await call()
+
+        while True:
+            stored = self._done.get(key)
+            if stored is not None:
+                return stored.replay()
+
+            running = self._running.get(key)
+            if running is None:
+                break
+            # Same key in flight: wait, then replay (or run, if it failed)
+            await asyncio.shield(running)
+
+        finished = asyncio.get_running_loop().create_future()
+        self._running[key] = finished
+        try:
+            response = await call()
+            # Server errors and streamed bodies are not kept; retrying those is fine
+            if response.status_code < 500 and hasattr(response, "body"):
+                self._done.set(key, StoredResponse.from_response(response))
+            return response
+        finally:
+            del self._running[key]
+            finished.set_result(None)
+
+    def clear(self) -> None:
+        self._done.clear()
+
+
+idempotency = IdempotencyStore(
+    maxsize=settings.IDEMPOTENCY_MAX_ENTRIES,
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+)
+
+
+async def idempotent(request: Request, user_id: int, call: Callable[[], Awaitable[Response]]) -> Response:
+    """Run a checkout handler body at most once per user, path and key."""
+    key = await request_key(request)
+    scope = (user_id, request.url.path, key) if key else None
+    return await idempotency.run(scope, call)
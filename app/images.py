@@ -0,0 +1,85 @@
+# app/images.py
+# -------------------------------------------------------
+# Course thumbnail URLs and responsive variants.
+#
+# A course thumbnail is either a bare file name under app/static/images
+# (seed data) or a full URL returned by the storage backend (uploads).
+# Resized variants are recorded on Course.thumbnail_variants as
+# {"<width>": "<url>"}; for the bundled static images they are looked up
+# in app/static/images/derived, produced by `python -m app.thumbnails`.
+# -------------------------------------------------------
+
+import io
+import os
+from functools import lru_cache
+from typing import Dict, Optional
+
+from .assets import asset_url
+
+THUMBNAIL_WIDTHS = (200, 400, 800)
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 80
+
+STATIC_IMAGE_DIR = os.path.join("app", "static", "images")
+DERIVED_IMAGE_DIR = os.path.join(STATIC_IMAGE_DIR, "derived")
+
+
+def thumbnail_url(path: Optional[str]) -> str:
+    if not path:
+        return ""
+    if path.startswith(("http://", "https://", "/")):
+        return path
+    return asset_url(f"images/{path}")
+
+
+def variant_name(name: str, width: int) -> str:
+    stem = os.path.splitext(name)[0]
+    return f"{stem}_{width}w.{THUMBNAIL_FORMAT.lower()}"
+
+
+@lru_cache(maxsize=1)
+def _static_variants() -> Dict[str, Dict[int, str]]:
+    """{"python.png": {200: "images/derived/python_200w.webp", ...}}"""
+    found: Dict[str, Dict[int, str]] = {}
+    if not os.path.isdir(DERIVED_IMAGE_DIR):
+        return found
+
+    for source in os.listdir(STATIC_IMAGE_DIR):
+        for width in THUMBNAIL_WIDTHS:
+            derived = variant_name(source, width)
+            if os.path.exists(os.path.join(DERIVED_IMAGE_DIR, derived)):
+                found.setdefault(source, {})[width] = f"images/derived/{derived}"
+    return found
+
+
+def thumbnail_srcset(path: Optional[str], variants=None) -> str:
+    if variants:
+        pairs = {int(w): url for w, url in dict(variants).items()}
+    else:
+        pairs = {w: asset_url(name) for w, name in _static_variants().get(path or "", {}).items()}
+    return ", ".join(f"{url} {w}w" for w, url in sorted(pairs.items()))
+
+
+def render_variants(data: bytes, widths=THUMBNAIL_WIDTHS) -> Dict[int, bytes]:
+    """
+    Resize and recompress an image to each width narrower than the
+    original. CPU bound: call it from a thread, not the event loop.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as original:
+        original.load()
+        image = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+
+    variants = {}
+    for width in widths:
+        if width >= image.width:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+
+        out = io.BytesIO()
+        resized.save(out, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY, method=4)
+        variants[width] = out.getvalue()
+
+    return variants
@@ -0,0 +1,274 @@
+# app/jobs.py
+# -------------------------------------------------------
+# Durable background jobs, stored in the `jobs` table.
+#
+# Handlers enqueue work in their own transaction, so a job exists if and
+# only if the change that asked for it was committed, and it survives a
+# pod restart. Worker tasks in every app process (JOB_WORKERS; 0 = this
+# process only enqueues) poll for due jobs and run them:
+#
+#   claim    UPDATE ... SET status='running', locked_until=now+timeout
+#            WHERE id=? AND still claimable; a row count of 1 means this
+#            worker won it, so no row locks or SKIP LOCKED are needed
+#   success  status='done' (deleted after JOB_RETENTION_HOURS)
+#   failure  back to 'queued' with exponential backoff, or 'failed'
+#            after max_attempts
+#
+# A job whose worker died is claimable again once locked_until passes
+# (the visibility timeout), so handlers must be safe to run twice.
+#
+#   @job_handler("thumbnails.generate")
+#   async def generate(payload): ...
+#
+#   enqueue(db, "thumbnails.generate", {"course_id": 1, ...})
+#   await db.commit()
+# -------------------------------------------------------
+
+import asyncio
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import and_, delete, event, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import metrics
+from .database import AsyncSessionLocal
+from .models import Job
+from .settings import settings
+
+Handler = Callable[[dict], Awaitable[None]]
+
+_handlers: Dict[str, Handler] = {}
+
+JOBS = metrics.registry.counter(
+    "jobs_total", "Background jobs run, by kind and outcome.", ("kind", "outcome"))
+JOB_SECONDS = metrics.registry.histogram(
+    "job_duration_seconds", "Background job run time.", ("kind",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0))
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def job_handler(kind: str):
+    """Register an async function(payload) as the handler for `kind`."""
+    def register(func: Handler) -> Handler:
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: dict,
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+) -> Job:
+    """Add a job to the session; it is queued when the session commits."""
+    now = utcnow()
+    job = Job(
+        kind=kind,
+        payload=payload,
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+    db.add(job)
+    return job
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential, capped at an hour, with jitter so retries spread out."""
+    delay = min(settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), 3600)
+    return delay * random.uniform(0.75, 1.25)
+
+
+# -------------------------------------------------------
+# Worker
+# -------------------------------------------------------
+def _claimable(now: datetime):
+    return or_(
+        and_(Job.status == "queued", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+
+
+class JobWorker:
+    def __init__(self, concurrency: int, session_factory=AsyncSessionLocal):
+        self.concurrency = concurrency
+        self._session_factory = session_factory
+        self._name = f"{socket.gethostname()}:{os.getpid()}"[:64]
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._last_cleanup = 0.0
+
+    def wake(self) -> None:
+        """Look for work now instead of at the next poll."""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._tasks or self.concurrency <= 0:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Let running jobs finish for a grace period, then cancel them."""
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=settings.JOB_SHUTDOWN_GRACE_SECONDS)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                ran = await self.run_once()
+            except Exception as e:
+                print("JOB WORKER ERROR:", e)
+                ran = False
+
+            if ran or self._stopping:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_once(self) -> bool:
+        """Claim and run one due job. Returns False when there was none."""
+        job = await self._claim()
+        if job is None:
+            await self._cleanup()
+            return False
+
+        started = time.perf_counter()
+        handler = _handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"no handler for job kind {job.kind!r}")
+            await asyncio.wait_for(handler(job.payload), settings.JOB_VISIBILITY_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            # Shutting down: hand it back for the next worker right away
+            await asyncio.shield(self._release(job))
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:2000]
+            print("JOB ERROR:", job.kind, job.id, error)
+            await self._fail(job, error)
+        else:
+            await self._finish(job)
+        finally:
+            JOB_SECONDS.labels(job.kind).observe(time.perf_counter() - started)
+        return True
+
+    async def _claim(self) -> Optional[Job]:
+        now = utcnow()
+        async with self._session_factory() as db:
+            candidates = (await db.execute(
+                select(Job.id).where(_claimable(now)).order_by(Job.run_at).limit(self.concurrency)
+            )).scalars().all()
+
+            # Workers race for the same rows; the conditional UPDATE picks one
+            random.shuffle(candidates)
+            for job_id in candidates:
+                claimed = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, _claimable(now))
+                    .values(
+                        status="running",
+                        attempts=Job.attempts + 1,
+                        locked_by=self._name,
+                        locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS),
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if claimed.rowcount == 1:
+                    return await db.get(Job, job_id)
+        return None
+
+    async def _settle(self, job: Job, **values) -> None:
+        # Only if still ours; after a visibility timeout someone else may
+        # have claimed it (which bumped attempts)
+        async with self._session_factory() as db:
+            await db.execute(
+                update(Job)
+                .where(
+                    Job.id == job.id,
+                    Job.status == "running",
+                    Job.locked_by == self._name,
+                    Job.attempts == job.attempts,
+                )
+                .values(locked_until=None, **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def _finish(self, job: Job) -> None:
+        JOBS.labels(job.kind, "done").inc()
+        await self._settle(job, status="done", finished_at=utcnow(), last_error=None)
+
+    async def _fail(self, job: Job, error: str) -> None:
+        if job.attempts >= job.max_attempts:
+            JOBS.labels(job.kind, "failed").inc()
+            await self._settle(job, status="failed", finished_at=utcnow(), last_error=error)
+        else:
+            JOBS.labels(job.kind, "retried").inc()
+            run_at = utcnow() + timedelta(seconds=backoff_seconds(job.attempts))
+            await self._settle(job, status="queued", run_at=run_at, last_error=error, locked_by=None)
+
+    async def _release(self, job: Job) -> None:
+        await self._settle(job, status="queued", attempts=Job.attempts - 1, locked_by=None)
+
+    async def _cleanup(self) -> None:
+        # At most once a minute per process, when there is nothing to do
+        if time.monotonic() - self._last_cleanup < 60:
+            return
+        self._last_cleanup = time.monotonic()
+        cutoff = utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+        async with self._session_factory() as db:
+            await db.execute(
+                delete(Job).where(Job.status == "done", Job.finished_at < cutoff)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+
+job_worker = JobWorker(concurrency=settings.JOB_WORKERS)
+
+
+# -------------------------------------------------------
+# Wake the local workers when a transaction that enqueued commits
+# -------------------------------------------------------
+@event.listens_for(Session, "after_flush")
+def _note_enqueued(session, flush_context):
+    if any(isinstance(obj, Job) for obj in session.new):
+        session.info["jobs_enqueued"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers(session):
+    if session.info.pop("jobs_enqueued", False):
+        job_worker.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_enqueued(session):
+    session.info.pop("jobs_enqueued", None)
@@ -1,14 +1,9 @@
 from fastapi import FastAPI, Request
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, Response
 
-from starlette.middleware.sessions import SessionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
-from sqlalchemy import text
-from sqlalchemy.future import select
-from .database import engine, Base, AsyncSessionLocal
+from .database import engine, read_engine, Base, warm_pool
 
 from .routes import (
     users,
@@ -18,11 +13,24 @@ from .routes import (
     payment,
     dashboard,
     lessons,
+    enrollments,
+    progress,
     ui
 )
 
 from .auth import get_current_user
-from .models import Course
+from .querystats import QueryStatsMiddleware
+from . import metrics
+from .catalog import catalog
+from .search import search_service
+from .hashing import hasher
+from .jobs import job_worker
+from .progress import progress_buffer
+from . import thumbnails, receipts  # job handlers
+from .storage import close_storage
+from .sessions import ServerSessionMiddleware, get_session_store, close_session_store
+from .assets import AssetStaticFiles, init_assets, manifest
+from .templating import templates, precompile_templates
 
 # -------------------------------------------------------
 #   APP SETUP
@@ -30,20 +38,13 @@ from .models import Course
 
 app = FastAPI(title="Learning Platform")
 
-# Templates
-templates = Jinja2Templates(directory="app/templates")
+# Templates (one shared environment, see templating.py)
 app.state.templates = templates
 
 
-# Session Middleware (must be added BEFORE any custom middleware)
 from .settings import settings
 
-app.add_middleware(
-    SessionMiddleware,
-    secret_key=settings.SESSION_SECRET,
-    same_site="lax"
-)
-
+IS_PRODUCTION = settings.ENV in ("production", "prod")
 
 
 # CORS (optional)
@@ -59,19 +60,26 @@ app.add_middleware(
 # -------------------------------------------------------
 #   USER MIDDLEWARE – attaches logged-in user
 # -------------------------------------------------------
+# Paths that never render a page for a user, so there is no point in
+# touching the session store or the database for them.
+PUBLIC_PATH_PREFIXES = (
+    "/static",
+    "/docs",
+    "/redoc",
+    "/openapi.json",
+    "/favicon.ico",
+    "/health",
+    "/metrics",
+)
+
+
 @app.middleware("http")
 async def attach_user(request: Request, call_next):
-    try:
-        # --- SAFE DEBUG PRINT ---
-        session_safe = None
-        try:
-            session_safe = dict(request.session)
-        except Exception:
-            session_safe = "UNREADABLE SESSION"
-
-        # print("DEBUG SESSION:", session_safe)
-        # -------------------------
+    if request.url.path.startswith(PUBLIC_PATH_PREFIXES):
+        request.state.user = None
+        return await call_next(request)
 
+    try:
         request.state.user = await get_current_user(request)
 
     except Exception as e:
@@ -81,6 +89,31 @@ async def attach_user(request: Request, call_next):
     return await call_next(request)
 
 
+# Server-side sessions; added after attach_user so it wraps it
+app.add_middleware(
+    ServerSessionMiddleware,
+    cookie_name=settings.SESSION_COOKIE_NAME,
+    max_age=settings.SESSION_MAX_AGE_SECONDS,
+    refresh_after=settings.SESSION_REFRESH_SECONDS,
+    same_site="lax",
+    https_only=settings.SESSION_COOKIE_SECURE,
+    exclude_prefixes=PUBLIC_PATH_PREFIXES,
+)
+
+# Counts SQL per request; added after attach_user so it wraps it and the
+# user lookup is counted too
+app.add_middleware(QueryStatsMiddleware)
+
+# Outermost of our middleware, so request latency covers all of the above
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+if read_engine is not engine:
+    metrics.instrument_engine(read_engine, "read")
+metrics.registry.gauge(
+    "password_hash_pending", "Password hashes queued or running.",
+    callback=lambda: hasher.queue_depth,
+)
+
 
 # -------------------------------------------------------
 #   ROUTERS
@@ -94,33 +127,74 @@ app.include_router(course_detail.router)
 app.include_router(payment.router)
 app.include_router(dashboard.router)
 app.include_router(lessons.router)
+app.include_router(enrollments.router)
+app.include_router(progress.router)
 
 
 # -------------------------------------------------------
-#   STARTUP – DB INIT + SAMPLE DATA
+#   STARTUP
 # -------------------------------------------------------
 @app.on_event("startup")
 async def on_startup():
 
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    hasher.start()
+    get_session_store()   # fail fast on a bad SESSION_BACKEND
+    init_assets()
+    precompile_templates()
+
+    # Production schemas come from `alembic upgrade head`; create_all is
+    # a local-dev convenience (one round trip per table)
+    create_all = settings.DB_CREATE_ALL
+    if create_all is None:
+        create_all = not IS_PRODUCTION
+    if create_all:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    # Open the pool's connections now rather than on the first requests
+    await warm_pool()
+    if read_engine is not engine:
+        await warm_pool(bind=read_engine)
+
+    # Build the catalog snapshot before the first request needs it
+    snapshot = await catalog.get()
+    if not snapshot.courses:
+        print("No courses yet; load sample data with: python scripts/seed_courses.py")
+
+    # The search index is built in the background
+    search_service.start()
+
+    # Background job workers (JOB_WORKERS=0 leaves jobs to other processes)
+    job_worker.start()
+
+    # Writes buffered lesson progress every PROGRESS_FLUSH_INTERVAL_SECONDS
+    progress_buffer.start()
 
-    async with AsyncSessionLocal() as session:
-        await session.execute(text("SELECT 1"))
 
-    # Add sample courses if DB empty
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Course))
-        existing = result.scalars().all()
+@app.on_event("shutdown")
+async def on_shutdown():
+    await progress_buffer.stop()   # writes what is still buffered
+    await job_worker.stop()
+    await search_service.stop()
+    hasher.shutdown()
+    await close_storage()
+    await close_session_store()
 
-        if not existing:
-            sample_courses = [
-                Course(title="Python for Beginners", description="Learn Python basics.", thumbnail_path="python.png"),
-                Course(title="Advanced Python", description="Master advanced Python techniques.", thumbnail_path="advanced_python.png"),
-                Course(title="FastAPI Bootcamp", description="Build APIs with FastAPI.", thumbnail_path="fastapi.png"),
-            ]
-            session.add_all(sample_courses)
-            await session.commit()
+
+# -------------------------------------------------------
+#   HEALTH (liveness/readiness probes in helm/values.yaml)
+# -------------------------------------------------------
+@app.get("/health")
+async def health():
+    return {"status": "ok", "password_hashing": hasher.stats()}
+
+
+# -------------------------------------------------------
+#   METRICS (Prometheus text format, see metrics.py)
+# -------------------------------------------------------
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 
 # -------------------------------------------------------
@@ -133,6 +207,5 @@ async def home(request: Request):
         {"request": request}
     )
 
-app.add_middleware(SessionMiddleware, secret_key=settings.SESSION_SECRET)
-# Static Files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
\ No newline at end of file
+# Static Files (fingerprinted URLs are served from the asset manifest)
+app.mount("/static", AssetStaticFiles(directory="app/static", manifest=manifest), name="static")
\ No newline at end of file
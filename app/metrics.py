@@ -0,0 +1,358 @@
+# app/metrics.py
+# -------------------------------------------------------
+# In-process Prometheus metrics, served as text at /metrics.
+#
+# Deliberately tiny instead of prometheus_client: everything runs on the
+# event loop thread, so updating a metric is a dict lookup plus an
+# addition (and a bisect for histograms), with no locks. Values that
+# already live elsewhere (pool size, hasher queue) are read at scrape
+# time by callback gauges rather than tracked on every request.
+#
+#   REQUEST_SECONDS.labels("GET", "/courses").observe(0.012)
+# -------------------------------------------------------
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    """A settable value, or a callback read at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        # callback() -> number, or {label values tuple: number}
+        self._callback = callback
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def _samples(self):
+        if self._callback is None:
+            yield from super()._samples()
+            return
+
+        try:
+            values = self._callback()
+        except Exception:
+            return
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, label_values)} {_format_value(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, n in zip(self.upper_bounds + (float("inf"),), child.counts):
+                cumulative += n
+                le = 'le="%s"' % _format_value(bound)
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# -------------------------------------------------------
+# Application metrics
+# -------------------------------------------------------
+REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.")
+
+DB_POOL_WAIT_SECONDS = registry.histogram(
+    "db_pool_wait_seconds", "Time a request waits for a connection from the pool.", ("pool",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0))
+DB_POOL_HOLD_SECONDS = registry.histogram(
+    "db_pool_hold_seconds", "How long a connection stays checked out.", ("pool",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0))
+DB_POOL_CONNECTS = registry.counter(
+    "db_pool_connections_opened_total", "New database connections opened by the pool.", ("pool",))
+
+TEMPLATE_RENDER_SECONDS = registry.histogram(
+    "template_render_seconds", "Jinja2 page render time.", ("template",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+
+STORAGE_UPLOAD_SECONDS = registry.histogram(
+    "storage_upload_seconds", "Blob upload time.", ("backend", "outcome"),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+STORAGE_UPLOAD_BYTES = registry.counter(
+    "storage_upload_bytes_total", "Bytes uploaded to blob storage.", ("backend",))
+
+
+_engines: Dict[str, object] = {}
+
+# Set by acquire_connection() just before a request session asks the
+# pool for its connection; the checkout listener observes the elapsed
+# time (it runs in the asking task's context)
+_wait_started: ContextVar[Optional[float]] = ContextVar("db_pool_wait_started", default=None)
+
+
+async def acquire_connection(session) -> None:
+    """Check out `session`'s connection now, timing the wait (db_pool_wait_seconds)."""
+    token = _wait_started.set(time.perf_counter())
+    try:
+        await session.connection()
+    finally:
+        _wait_started.reset(token)
+
+
+def _pool_stat(method):
+    def read():
+        # The pool is looked up each time (dispose() replaces it);
+        # NullPool / StaticPool have no size to report
+        pools = {name: engine.sync_engine.pool for name, engine in _engines.items()}
+        return {(name,): getattr(pool, method)() for name, pool in pools.items() if hasattr(pool, method)}
+    return read
+
+
+registry.gauge("db_pool_size", "Configured pool size.", ("pool",), callback=_pool_stat("size"))
+registry.gauge("db_pool_checked_out", "Connections currently checked out.", ("pool",),
+               callback=_pool_stat("checkedout"))
+registry.gauge("db_pool_overflow", "Connections open beyond the pool size.", ("pool",),
+               callback=_pool_stat("overflow"))
+registry.gauge("db_pool_checked_in", "Idle connections in the pool.", ("pool",),
+               callback=_pool_stat("checkedin"))
+
+
+def instrument_engine(engine, name: str = "primary") -> None:
+    """
+    Pool gauges (read at scrape time), plus connections opened, the
+    wait for a connection (request sessions, see acquire_connection) and
+    how long each checkout is held, from SQLAlchemy's public pool events.
+    """
+    # Listeners stay on the engine's pool across dispose()
+    pool = engine.sync_engine.pool
+    _engines[name] = engine
+    opened = DB_POOL_CONNECTS.labels(name)
+    waited = DB_POOL_WAIT_SECONDS.labels(name)
+    held = DB_POOL_HOLD_SECONDS.labels(name)
+
+    def on_connect(dbapi_connection, connection_record):
+        opened.inc()
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        now = time.perf_counter()
+        started = _wait_started.get()
+        if started is not None:
+            waited.observe(now - started)
+        connection_record.info["checked_out_at"] = now
+
+    def on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            held.observe(time.perf_counter() - started)
+
+    event.listen(pool, "connect", on_connect)
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", on_checkin)
+
+
+# -------------------------------------------------------
+# Middleware
+# -------------------------------------------------------
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("endpoint") is not None and scope.get("root_path"):
+        return scope["root_path"]     # a mounted app, e.g. /static
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Request count, latency and in-flight requests. Latency is labelled
+    with the route template ("/course/{course_id}"), never the raw path,
+    so the number of series stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels()
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            route = _route_label(scope)
+            method = scope["method"]
+            REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, status).inc()
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, Boolean, Text, ForeignKey, DateTime, JSON, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 # USE Base from database.py — DO NOT REDECLARE
 from .database import Base
+from .images import thumbnail_url, thumbnail_srcset
 
 
 class User(Base):
@@ -24,12 +25,21 @@ class Course(Base):
     title = Column(String(200), nullable=False)
     description = Column(Text)
     thumbnail_path = Column(String(512))
+    thumbnail_variants = Column(JSON, nullable=True)   # {"200": url, "400": url, ...}
     price_cents = Column(Integer, default=0)
     is_published = Column(Boolean, default=True)
 
     purchases = relationship('Purchase', back_populates='course')
     lessons = relationship("Lesson", back_populates="course", cascade="all, delete")
 
+    @property
+    def thumbnail_url(self):
+        return thumbnail_url(self.thumbnail_path)
+
+    @property
+    def thumbnail_srcset(self):
+        return thumbnail_srcset(self.thumbnail_path, self.thumbnail_variants)
+
 
 class Purchase(Base):
     __tablename__ = 'purchases'
@@ -43,14 +53,92 @@ class Purchase(Base):
     user = relationship('User', back_populates='purchases')
     course = relationship('Course', back_populates='purchases')
 
+    # One paid purchase per user and course. Partial, so unpaid attempts
+    # can repeat; it also serves the entitlement lookup (user_id, paid).
+    __table_args__ = (
+        Index(
+            'uq_purchases_user_course_paid', 'user_id', 'course_id', unique=True,
+            sqlite_where=text('paid = 1'),
+            mssql_where=text('paid = 1'),
+            postgresql_where=text('paid'),
+        ),
+    )
+
 
 class Lesson(Base):
     __tablename__ = "lessons"
 
     id = Column(Integer, primary_key=True, index=True)
     course_id = Column(Integer, ForeignKey("courses.id"))
+    # Order within the course (1, 2, ...); new lessons go last, see content.py
+    position = Column(Integer, nullable=False)
     title = Column(String(255), nullable=False)
     content = Column(Text, nullable=True)
     video_url = Column(String(500), nullable=True)
 
+    # Derived from content / video_url when they are written; see content.py
+    content_html = Column(Text, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    video_embed_id = Column(String(64), nullable=True)
+
     course = relationship("Course", back_populates="lessons")
+
+    __table_args__ = (
+        # Lesson lists and prev/next walk a course in this order
+        Index("ix_lessons_course_position", "course_id", "position"),
+    )
+
+
+class LessonProgress(Base):
+    """How far a user is through a lesson; written in batches by progress.py."""
+    __tablename__ = "lesson_progress"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="CASCADE"), nullable=False)
+    position_seconds = Column(Float, nullable=False, default=0)
+    duration_seconds = Column(Float, nullable=True)
+    completed = Column(Boolean, nullable=False, default=False)
+    completed_at = Column(DateTime, nullable=True)      # naive UTC
+    updated_at = Column(DateTime, nullable=False)       # when the latest ping arrived
+
+    # One row per user and lesson; also serves "this user's progress"
+    __table_args__ = (
+        Index("uq_lesson_progress_user_lesson", "user_id", "lesson_id", unique=True),
+    )
+
+
+class SearchChange(Base):
+    """A course/lesson whose search entry changed; every replica polls these (search.py)."""
+    __tablename__ = "search_changes"
+
+    id = Column(Integer, primary_key=True)
+    doc_type = Column(String(10), nullable=False)       # course | lesson | all (= rebuild)
+    doc_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False)       # naive UTC
+
+    __table_args__ = (
+        Index("ix_search_changes_created_at", "created_at"),
+    )
+
+
+class Job(Base):
+    """Queued background work; see jobs.py."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="queued")   # queued | running | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)           # naive UTC
+    locked_until = Column(DateTime, nullable=True)      # visibility timeout of a running job
+    locked_by = Column(String(64), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
@@ -0,0 +1,87 @@
+# app/pagination.py
+# -------------------------------------------------------
+# Keyset (cursor) pagination.
+#
+# Pages are addressed by the id of the last row already seen, wrapped
+# in an opaque cursor, so fetching page N costs the same as page 1.
+# The page size is clamped to PAGE_SIZE_MAX on the server.
+# -------------------------------------------------------
+
+import base64
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from .settings import settings
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(raw)["id"]
+        if not isinstance(last_id, int):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
+
+@dataclass
+class PageParams:
+    after_id: Optional[int]
+    limit: int
+
+
+@dataclass
+class CourseFilters:
+    published: Optional[bool]
+    min_price: Optional[int]
+    max_price: Optional[int]
+
+    def matches(self, course) -> bool:
+        if self.published is not None and bool(course.is_published) != self.published:
+            return False
+        price = course.price_cents or 0
+        if self.min_price is not None and price < self.min_price:
+            return False
+        if self.max_price is not None and price > self.max_price:
+            return False
+        return True
+
+
+def page_params(
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1),
+) -> PageParams:
+    return PageParams(after_id=decode_cursor(cursor), limit=min(limit, settings.PAGE_SIZE_MAX))
+
+
+def course_filters(
+    min_price: Optional[int] = Query(None, ge=0, description="Minimum price in cents"),
+    max_price: Optional[int] = Query(None, ge=0, description="Maximum price in cents"),
+) -> CourseFilters:
+    # Public listings only ever show published courses; drafts are not a
+    # client-selectable filter
+    return CourseFilters(published=True, min_price=min_price, max_price=max_price)
+
+
+def next_cursor(rows, limit: int) -> Optional[str]:
+    """`rows` holds up to limit + 1 items; the extra one means there is a next page."""
+    if len(rows) <= limit:
+        return None
+    return encode_cursor(rows[limit - 1].id)
+
+
+def set_next_page_headers(request, response, cursor: Optional[str]) -> None:
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+        response.headers["Link"] = f'<{request.url.include_query_params(cursor=cursor)}>; rel="next"'
@@ -0,0 +1,359 @@
+# app/progress.py
+# -------------------------------------------------------
+# Lesson progress, buffered in memory and written in batches.
+#
+# Video players ping every few seconds per learner. A ping only updates
+# an in-memory entry keyed on (user, lesson), so repeated pings coalesce
+# into the latest one. A flusher task writes the waiting entries every
+# PROGRESS_FLUSH_INTERVAL_SECONDS, or sooner once PROGRESS_FLUSH_MAX_PENDING
+# are waiting, as a few set-based statements per batch (one SELECT, one
+# executemany INSERT, one or two executemany UPDATEs) in one transaction.
+# Shutdown flushes whatever is left.
+#
+# Reads merge the buffer over the stored rows, so a user sees their own
+# latest progress at once. Each process buffers its own pings; a row only
+# moves forward in time (updated_at), so interleaved flushes from several
+# replicas keep the newest ping, and completion is never undone.
+#
+# The buffer is bounded. A failed flush puts its entries back, and an
+# entry is dropped after PROGRESS_FLUSH_MAX_ATTEMPTS failed flushes. A row
+# that can never be written (its lesson or user deleted meanwhile) is
+# found by writing the batch row by row, and dropped on its own. While
+# PROGRESS_MAX_BUFFERED entries wait, pings for new (user, lesson) pairs
+# get a 503 instead of growing memory during a database outage.
+#
+# Losing the last few seconds of pings if a process is killed is
+# acceptable for progress; purchases and enrollments never go through here.
+# -------------------------------------------------------
+
+import asyncio
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Float, bindparam, case, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import metrics
+from .database import AsyncSessionLocal
+from .jobs import utcnow
+from .models import Lesson, LessonProgress
+from .settings import settings
+
+Key = Tuple[int, int]       # (user_id, lesson_id)
+
+# Two IN lists of this many keys stay well under SQL Server's 2100 parameters
+FLUSH_CHUNK_SIZE = 500
+
+PINGS = metrics.registry.counter(
+    "progress_updates_total", "Lesson progress pings received.")
+FLUSHED = metrics.registry.counter(
+    "progress_rows_flushed_total", "Lesson progress rows written, after coalescing.")
+DROPPED = metrics.registry.counter(
+    "progress_rows_dropped_total", "Lesson progress rows given up on after failed writes.")
+REJECTED = metrics.registry.counter(
+    "progress_updates_rejected_total", "Lesson progress pings refused with 503, buffer full.")
+
+
+@dataclass(frozen=True)
+class Progress:
+    user_id: int
+    lesson_id: int
+    course_id: int
+    position_seconds: float
+    duration_seconds: Optional[float]
+    completed: bool
+    completed_at: Optional[datetime]
+    updated_at: datetime
+
+    def merge(self, newer: Optional["Progress"]) -> "Progress":
+        """`newer` on top of this one; completion sticks."""
+        if newer is None:
+            return self
+        if newer.updated_at < self.updated_at:
+            return newer.merge(self)
+        return replace(
+            newer,
+            duration_seconds=newer.duration_seconds or self.duration_seconds,
+            completed=self.completed or newer.completed,
+            completed_at=self.completed_at or newer.completed_at,
+        )
+
+    @classmethod
+    def from_row(cls, row, course_id: int) -> "Progress":
+        return cls(row.user_id, row.lesson_id, course_id, row.position_seconds,
+                   row.duration_seconds, row.completed, row.completed_at, row.updated_at)
+
+
+class ProgressBuffer:
+    def __init__(self, interval: float, max_pending: int, max_buffered: int, max_attempts: int,
+                 session_factory=AsyncSessionLocal):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_buffered = max_buffered
+        self.max_attempts = max_attempts
+        self._session_factory = session_factory
+        self._pending: Dict[Key, Progress] = {}
+        self._flushing: Dict[Key, Progress] = {}    # taken by a flush, not committed yet
+        self._failures: Dict[Key, int] = {}         # failed flushes per waiting entry
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record(
+        self,
+        user_id: int,
+        lesson_id: int,
+        course_id: int,
+        position_seconds: float,
+        duration_seconds: Optional[float] = None,
+        completed: bool = False,
+    ) -> Progress:
+        """Buffer one ping; returns the user's merged progress for the lesson."""
+        now = utcnow()
+        if duration_seconds and position_seconds >= duration_seconds * settings.PROGRESS_COMPLETE_RATIO:
+            completed = True
+        ping = Progress(user_id, lesson_id, course_id, position_seconds, duration_seconds,
+                        completed, now if completed else None, now)
+
+        key = (user_id, lesson_id)
+        if key not in self._pending and len(self._pending) >= self.max_buffered:
+            REJECTED.inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "5"},
+            )
+        current = self._pending.get(key) or self._flushing.get(key)
+        self._pending[key] = current.merge(ping) if current else ping
+        PINGS.inc()
+
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+        return self._pending[key]
+
+    def buffered(self, user_id: int, lesson_id: int) -> Optional[Progress]:
+        key = (user_id, lesson_id)
+        flushing = self._flushing.get(key)
+        pending = self._pending.get(key)
+        return flushing.merge(pending) if flushing else pending
+
+    def buffered_for_course(self, user_id: int, course_id: int) -> Dict[int, Progress]:
+        found = {}
+        for entries in (self._flushing, self._pending):
+            for (uid, lesson_id), p in entries.items():
+                if uid == user_id and p.course_id == course_id:
+                    found[lesson_id] = found[lesson_id].merge(p) if lesson_id in found else p
+        return found
+
+    # ---------------------------------------------------
+    # Flushing
+    # ---------------------------------------------------
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write everything still buffered."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print("PROGRESS FLUSH ERROR:", e, f"({self.pending} updates lost)")
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                await self.flush()
+            except Exception as e:
+                # Entries went back into the buffer; the next flush retries
+                print("PROGRESS FLUSH ERROR:", e)
+
+    async def flush(self) -> int:
+        """Write the buffered entries now. Returns how many were written."""
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+            dropped = 0
+            try:
+                entries = list(batch.values())
+                for start in range(0, len(entries), FLUSH_CHUNK_SIZE):
+                    dropped += await self._write(entries[start:start + FLUSH_CHUNK_SIZE])
+            except Exception:
+                # Put back what was taken, under anything newer, unless
+                # it has failed too often already
+                given_up = 0
+                for key, p in batch.items():
+                    failures = self._failures[key] = self._failures.get(key, 0) + 1
+                    if failures >= self.max_attempts:
+                        self._pending.pop(key, None)
+                        del self._failures[key]
+                        given_up += 1
+                    else:
+                        self._pending[key] = p.merge(self._pending.get(key))
+                if given_up:
+                    DROPPED.inc(given_up)
+                    print(f"PROGRESS FLUSH ERROR: dropped {given_up} updates after {self.max_attempts} attempts")
+                raise
+            finally:
+                self._flushing = {}
+            for key in batch:
+                self._failures.pop(key, None)
+            FLUSHED.inc(len(batch) - dropped)
+            return len(batch) - dropped
+
+    async def _write(self, entries: List[Progress]) -> int:
+        """Write one chunk; returns how many rows had to be dropped."""
+        async with self._session_factory() as db:
+            for _ in range(2):
+                try:
+                    await _upsert(db, entries)
+                    await db.commit()
+                    return 0
+                except IntegrityError:
+                    # Usually another process inserted one of these rows
+                    # first; it exists now, so the second pass updates it
+                    await db.rollback()
+
+            # Still failing: some row can never be written (e.g. an FK
+            # violation, its lesson or user was deleted). Write row by row
+            # so only those are dropped.
+            dropped = 0
+            for p in entries:
+                try:
+                    await _upsert(db, [p])
+                    await db.commit()
+                except IntegrityError as e:
+                    await db.rollback()
+                    DROPPED.inc()
+                    dropped += 1
+                    print("PROGRESS FLUSH ERROR: dropped", (p.user_id, p.lesson_id), e.orig)
+            return dropped
+
+
+async def _upsert(db: AsyncSession, entries: List[Progress]) -> None:
+    P = LessonProgress
+    T = LessonProgress.__table__    # Core UPDATE: executemany with our own WHERE
+    # Two plain IN lists (row-value IN isn't portable to SQL Server)
+    existing = {
+        (user_id, lesson_id): row_id
+        for user_id, lesson_id, row_id in (await db.execute(
+            select(P.user_id, P.lesson_id, P.id).where(
+                P.user_id.in_({p.user_id for p in entries}),
+                P.lesson_id.in_({p.lesson_id for p in entries}),
+            )
+        )).all()
+    }
+
+    new = [p for p in entries if (p.user_id, p.lesson_id) not in existing]
+    if new:
+        await db.execute(insert(P), [
+            {
+                "user_id": p.user_id,
+                "lesson_id": p.lesson_id,
+                "position_seconds": p.position_seconds,
+                "duration_seconds": p.duration_seconds,
+                "completed": p.completed,
+                "completed_at": p.completed_at,
+                "updated_at": p.updated_at,
+            }
+            for p in new
+        ])
+
+    # Position only moves to a newer ping (another replica may have
+    # written a later one); completion is set whatever the order
+    updated_at = bindparam("v_updated_at", type_=DateTime())
+    newer = T.c.updated_at < updated_at
+    values = {
+        "position_seconds": case((newer, bindparam("v_position", type_=Float())), else_=T.c.position_seconds),
+        "duration_seconds": case(
+            (newer, func.coalesce(bindparam("v_duration", type_=Float()), T.c.duration_seconds)),
+            else_=T.c.duration_seconds,
+        ),
+        "updated_at": case((newer, updated_at), else_=T.c.updated_at),
+    }
+    for completed in (False, True):
+        group = [p for p in entries if (p.user_id, p.lesson_id) in existing and p.completed == completed]
+        if not group:
+            continue
+        stmt_values = dict(values)
+        if completed:
+            stmt_values["completed"] = True
+            stmt_values["completed_at"] = func.coalesce(
+                T.c.completed_at, bindparam("v_completed_at", type_=DateTime()))
+        await db.execute(
+            update(T).where(T.c.id == bindparam("_id")).values(stmt_values),
+            [
+                {
+                    "_id": existing[(p.user_id, p.lesson_id)],
+                    "v_position": p.position_seconds,
+                    "v_duration": p.duration_seconds,
+                    "v_updated_at": p.updated_at,
+                    **({"v_completed_at": p.completed_at} if completed else {}),
+                }
+                for p in group
+            ],
+        )
+
+
+progress_buffer = ProgressBuffer(
+    interval=settings.PROGRESS_FLUSH_INTERVAL_SECONDS,
+    max_pending=settings.PROGRESS_FLUSH_MAX_PENDING,
+    max_buffered=settings.PROGRESS_MAX_BUFFERED,
+    max_attempts=settings.PROGRESS_FLUSH_MAX_ATTEMPTS,
+)
+
+metrics.registry.gauge(
+    "progress_pending", "Lesson progress updates buffered, not yet written.",
+    callback=lambda: progress_buffer.pending,
+)
+
+
+# -------------------------------------------------------
+# Reads (stored rows with this process's buffer on top)
+# -------------------------------------------------------
+async def get_progress(db: AsyncSession, user_id: int, lesson_id: int, course_id: int) -> Optional[Progress]:
+    row = (await db.execute(
+        select(LessonProgress).where(
+            LessonProgress.user_id == user_id, LessonProgress.lesson_id == lesson_id)
+    )).scalar_one_or_none()
+    stored = Progress.from_row(row, course_id) if row is not None else None
+    buffered = progress_buffer.buffered(user_id, lesson_id)
+    if stored is None:
+        return buffered
+    return stored.merge(buffered)
+
+
+async def get_course_progress(db: AsyncSession, user_id: int, course_id: int) -> Dict[int, Progress]:
+    """lesson_id -> Progress for the lessons of a course the user has started."""
+    rows = (await db.execute(
+        select(LessonProgress)
+        .join(Lesson, Lesson.id == LessonProgress.lesson_id)
+        .where(LessonProgress.user_id == user_id, Lesson.course_id == course_id)
+    )).scalars().all()
+    found = {row.lesson_id: Progress.from_row(row, course_id) for row in rows}
+    for lesson_id, p in progress_buffer.buffered_for_course(user_id, course_id).items():
+        found[lesson_id] = found[lesson_id].merge(p) if lesson_id in found else p
+    return found
@@ -0,0 +1,184 @@
+# app/querystats.py
+# -------------------------------------------------------
+# Per-request SQL statistics and N+1 detection.
+#
+# Engine cursor events record every statement run while a request is in
+# flight: how many, how long in total, and how often each statement
+# "shape" (the SQL with literals and parameter lists collapsed) repeats.
+# The same shape QUERY_REPEAT_THRESHOLD times or more in one request is
+# almost always a query inside a loop.
+#
+# - every request is logged to the "app.queries" logger as one JSON line
+#   (DEBUG normally, WARNING when it looks like an N+1 or is over budget);
+# - outside production the numbers are returned as X-DB-Query-Count,
+#   X-DB-Time-ms and X-DB-Repeated-Queries response headers;
+# - with QUERY_BUDGET_ENFORCE on (test runs), a route that issues more
+#   statements than its budget answers 500 instead of its response.
+#   Budgets come from @query_budget(n) on the endpoint, falling back to
+#   QUERY_BUDGET_DEFAULT.
+# -------------------------------------------------------
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from .database import engine, read_engine
+from .settings import settings
+
+logger = logging.getLogger("app.queries")
+
+_IN_LIST_RE = re.compile(r"\(\s*(?:\?|:\w+|%\(\w+\)s)(?:\s*,\s*(?:\?|:\w+|%\(\w+\)s))*\s*\)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SELECT ... WHERE id = 3 / WHERE id IN (?, ?, ?) -> WHERE id = ? / IN (?)"""
+    shape = _LITERAL_RE.sub("?", statement)
+    shape = _IN_LIST_RE.sub("(?)", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = None) -> dict:
+        """Shapes run at least `threshold` times: likely N+1 queries."""
+        threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def query_budget(max_queries: int):
+    """Declare how many statements an endpoint may issue (checked in test mode)."""
+    def decorate(endpoint):
+        endpoint.__query_budget__ = max_queries
+        return endpoint
+    return decorate
+
+
+# -------------------------------------------------------
+# Engine hooks (run inside SQLAlchemy's greenlet, which shares the
+# request task's context, so the ContextVar is visible here)
+# -------------------------------------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    starts = conn.info.get("query_start")
+    if stats is not None and starts:
+        stats.record(statement, time.perf_counter() - starts.pop())
+
+
+for _engine in {engine, read_engine}:
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# -------------------------------------------------------
+# Middleware
+# -------------------------------------------------------
+class QueryStatsMiddleware:
+    def __init__(self, app, headers: bool = None, enforce: bool = None):
+        self.app = app
+        self.headers = settings.ENV not in ("production", "prod") if headers is None else headers
+        self.enforce = settings.QUERY_BUDGET_ENFORCE if enforce is None else enforce
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = _current.set(stats)
+        over_budget = False
+
+        async def send_with_stats(message):
+            nonlocal over_budget
+
+            if message["type"] == "http.response.start":
+                budget = self._budget(scope)
+                over_budget = budget is not None and stats.count > budget
+
+                if over_budget and self.enforce:
+                    body = json.dumps({
+                        "detail": f"Query budget exceeded: {stats.count} > {budget}",
+                        "repeated": stats.repeated(),
+                    }).encode()
+                    await send({
+                        "type": "http.response.start",
+                        "status": 500,
+                        "headers": [
+                            (b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode()),
+                        ],
+                    })
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                if self.headers:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-db-query-count", str(stats.count).encode()),
+                        (b"x-db-time-ms", f"{stats.seconds * 1000:.2f}".encode()),
+                        (b"x-db-repeated-queries", str(len(stats.repeated())).encode()),
+                    ]
+
+            elif over_budget and self.enforce:
+                return  # the 500 has already been sent
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current.reset(token)
+            self._log(scope, stats, over_budget)
+
+    @staticmethod
+    def _budget(scope) -> Optional[int]:
+        endpoint = scope.get("endpoint")
+        budget = getattr(endpoint, "__query_budget__", None)
+        return budget if budget is not None else settings.QUERY_BUDGET_DEFAULT
+
+    @staticmethod
+    def _log(scope, stats: QueryStats, over_budget: bool) -> None:
+        repeated = stats.repeated()
+        level = logging.WARNING if repeated or over_budget else logging.DEBUG
+        if not logger.isEnabledFor(level):
+            return
+
+        route = scope.get("route")
+        logger.log(level, json.dumps({
+            "event": "db_queries",
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "route": getattr(route, "path", None),
+            "queries": stats.count,
+            "db_ms": round(stats.seconds * 1000, 2),
+            "repeated": repeated,
+            "over_budget": over_budget,
+        }))
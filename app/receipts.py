@@ -0,0 +1,40 @@
+# app/receipts.py
+# -------------------------------------------------------
+# Purchase receipts, sent by a "payments.receipt" job after checkout so
+# the payment response never waits on it.
+#
+# There is no mail provider configured yet; the receipt is rendered and
+# logged, which is where a provider call belongs.
+# -------------------------------------------------------
+
+from sqlalchemy import select
+
+from .database import AsyncSessionLocal
+from .jobs import job_handler
+from .models import Course, User
+
+
+def render_receipt(email: str, course_title: str, price_cents: int) -> str:
+    return (
+        f"To: {email}\n"
+        f"Subject: Your receipt for {course_title}\n\n"
+        f"Thanks for your purchase of {course_title}.\n"
+        f"Amount: ${(price_cents or 0) / 100:.2f}\n"
+    )
+
+
+@job_handler("payments.receipt")
+async def send_receipt(payload: dict) -> None:
+    async with AsyncSessionLocal() as db:
+        email = (await db.execute(
+            select(User.email).where(User.id == payload["user_id"])
+        )).scalar_one_or_none()
+        course = (await db.execute(
+            select(Course.title, Course.price_cents).where(Course.id == payload["course_id"])
+        )).one_or_none()
+
+    if email is None or course is None:
+        return
+
+    receipt = render_receipt(email, course.title, course.price_cents)
+    print("RECEIPT:", receipt.replace("\n", " | "))
@@ -5,12 +5,12 @@ from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from ..database import get_db
-from ..models import Course, Purchase
+from ..database import get_read_db
+from ..models import Course
 from ..auth import get_current_user
-from fastapi.templating import Jinja2Templates
+from ..templating import templates
+from ..entitlements import has_course_access
 
-templates = Jinja2Templates(directory="app/templates")
 
 router = APIRouter()
 
@@ -19,7 +19,7 @@ router = APIRouter()
 async def course_detail(
     course_id: int,
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
     # Fetch course
@@ -32,14 +32,7 @@ async def course_detail(
     # Check user purchase
     has_access = False
     if current_user:
-        purchase = await db.execute(
-            select(Purchase).where(
-                Purchase.user_id == current_user.id,
-                Purchase.course_id == course_id,
-                Purchase.paid == True
-            )
-        )
-        has_access = purchase.scalar_one_or_none() is not None
+        has_access = await has_course_access(db, current_user.id, course_id)
 
     return templates.TemplateResponse(
         "course_detail.html",
@@ -1,12 +1,14 @@
 # app/routes/courses.py
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from azure.storage.blob.aio import BlobClient
 from ..database import get_db
-from ..crud import list_courses, get_course
+from ..crud import list_courses_page, get_course
+from ..pagination import CourseFilters, PageParams, course_filters, page_params, set_next_page_headers
 from ..schemas import CourseOut, CourseBase
 from ..models import Course
-from app.settings import settings
+from ..storage import get_storage, iter_upload
+from ..jobs import enqueue
+from ..search import search_service
 
 import uuid
 
@@ -14,8 +16,34 @@ router = APIRouter(prefix='/courses', tags=['courses'])
 
 
 @router.get('/', response_model=list[CourseOut])
-async def all_courses(db: AsyncSession = Depends(get_db)):
-    return await list_courses(db)
+async def all_courses(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    filters: CourseFilters = Depends(course_filters),
+):
+    # The next page is advertised in X-Next-Cursor / Link headers so the
+    # body stays a plain list for existing clients.
+    courses, cursor = await list_courses_page(page, filters)
+    set_next_page_headers(request, response, cursor)
+    return courses
+
+
+@router.get('/search')
+async def search_courses(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+):
+    # BM25-ranked courses and lessons (lessons by title only; bodies are never indexed)
+    return {"query": q, "ready": search_service.ready, "results": search_service.search(q, limit)}
+
+
+@router.get('/search/suggest')
+async def suggest_courses(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+):
+    return {"query": q, "suggestions": search_service.suggest(q, limit)}
 
 
 @router.post('/', response_model=CourseOut)
@@ -43,22 +71,16 @@ async def upload_thumbnail(
     extension = file.filename.split(".")[-1]
     blob_name = f"course_{course_id}_{uuid.uuid4().hex}.{extension}"
 
-    # 3. Create Blob Client
-    blob_client = BlobClient.from_connection_string(
-        conn_str=settings.AZURE_STORAGE_CONNECTION_STRING,
-        container_name=settings.AZURE_BLOB_CONTAINER,
-        blob_name=blob_name
+    # 3. Stream the file to storage (shared, pooled client)
+    blob_url = await get_storage().upload(
+        iter_upload(file), blob_name, content_type=file.content_type
     )
 
-    # 4. Read bytes & upload
-    data = await file.read()
-    await blob_client.upload_blob(data, overwrite=True)
-
-    # 5. Construct URL
-    blob_url = blob_client.url
-
-    # 6. Save URL in DB
+    # 4. Save URL in DB (old variants belong to the previous image), and
+    #    queue the resized variants in the same transaction
     crs.thumbnail_path = blob_url
+    crs.thumbnail_variants = None
+    enqueue(db, "thumbnails.generate", {"course_id": course_id, "blob_name": blob_name})
     await db.commit()
     await db.refresh(crs)
 
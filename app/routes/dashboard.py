@@ -2,31 +2,28 @@
 from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from fastapi.templating import Jinja2Templates
 
-from ..database import get_db
-from ..models import Purchase, Course
+from ..database import get_read_db
+from ..models import Course
 from ..auth import get_current_user
+from ..templating import templates
+from ..entitlements import get_owned_course_ids
+from ..querystats import query_budget
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/dashboard")
+@query_budget(3)
 async def dashboard(request: Request,
-                    db: AsyncSession = Depends(get_db),
+                    db: AsyncSession = Depends(get_read_db),
                     current_user=Depends(get_current_user)):
 
-    q = await db.execute(
-        select(Purchase).where(Purchase.user_id == current_user.id, Purchase.paid == True)
-    )
-    purchases = q.scalars().all()
+    owned = await get_owned_course_ids(db, current_user.id)
 
     courses = []
-    for p in purchases:
-        r = await db.execute(select(Course).where(Course.id == p.course_id))
-        c = r.scalars().first()
-        if c:
-            courses.append(c)
+    if owned:
+        r = await db.execute(select(Course).where(Course.id.in_(owned)))
+        courses = r.scalars().all()
 
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
@@ -0,0 +1,54 @@
+# app/routes/enrollments.py
+import secrets
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_db
+from ..enrollments import EnrollmentInputError, EnrollmentReport, enroll_many, iter_enrollments, iter_lines
+from ..settings import settings
+
+router = APIRouter(prefix="/enrollments", tags=["enrollments"])
+
+
+def require_admin_token(x_admin_token: str | None = Header(None)):
+    # Disabled unless ADMIN_API_TOKEN is configured
+    expected = settings.ADMIN_API_TOKEN
+    if not expected or not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(403, "Admin token required")
+
+
+# -------------------------
+# BULK ENROLL (streamed NDJSON or CSV)
+# -------------------------
+@router.post("/bulk", dependencies=[Depends(require_admin_token)])
+async def bulk_enroll(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Grant paid access to many users at once. The body is read as it
+    arrives and written in batches, so it can hold any number of rows.
+
+        Content-Type: application/x-ndjson
+        {"email": "a@example.com", "course_id": 3}
+        {"email": "b@example.com", "course_ids": [3, 4]}
+
+        Content-Type: text/csv
+        email,course_id
+        a@example.com,3
+
+    Rows for unknown users or courses are skipped and listed in the
+    response; users who already own a course are left as they are.
+    """
+    content_type = request.headers.get("content-type", "")
+    fmt = "csv" if content_type.startswith("text/csv") else "ndjson"
+
+    report = EnrollmentReport()
+    pairs = iter_enrollments(iter_lines(request.stream()), fmt, report)
+    try:
+        await enroll_many(db, pairs, report)
+    except EnrollmentInputError as e:
+        raise HTTPException(400, str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(400, "Body must be UTF-8")
+
+    return asdict(report)
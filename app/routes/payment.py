@@ -1,23 +1,25 @@
 from fastapi import APIRouter, Depends, Request
-from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 import random
 
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..auth import get_current_user
-from ..models import Course, Purchase
+from ..templating import templates
+from ..models import Course
+from ..entitlements import grant_course_access, has_course_access
+from ..idempotency import idempotent, new_key
+from ..jobs import enqueue
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 
 # ------------------------------
 # STEP 1 — Load payment page
 # ------------------------------
 @router.get("/payment/{course_id}")
-async def payment_page(course_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+async def payment_page(course_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
 
     q = await db.execute(select(Course).where(Course.id == course_id))
     course = q.scalar_one_or_none()
@@ -27,7 +29,8 @@ async def payment_page(course_id: int, request: Request, db: AsyncSession = Depe
 
     return templates.TemplateResponse("payment.html", {
         "request": request,
-        "course": course
+        "course": course,
+        "idempotency_key": new_key()
     })
 
 
@@ -45,37 +48,44 @@ async def process_payment(
     if not current_user:
         return RedirectResponse("/login", status_code=303)
 
-    form = await request.form()
-    card_number = form.get("card_number")
-    cvv = form.get("cvv")
+    # A retry with the same idempotency key replays the first outcome
+    # (approved or declined) instead of charging again
+    async def checkout():
+        # Already owned: nothing to charge
+        if await has_course_access(db, current_user.id, course_id):
+            return templates.TemplateResponse(
+                "payment_success.html",
+                {"request": request, "course_id": course_id}
+            )
+
+        form = await request.form()
+        card_number = form.get("card_number")
+        cvv = form.get("cvv")
+
+        # Basic fake validation
+        if len(card_number) < 12 or len(cvv) < 3:
+            return templates.TemplateResponse(
+                "payment_failed.html",
+                {"request": request, "course_id": course_id}
+            )
+
+        # Fake random approval / decline (50% chance)
+        approved = random.choice([True, False, True])  # slightly biased to approve
+
+        if not approved:
+            return templates.TemplateResponse(
+                "payment_failed.html",
+                {"request": request, "course_id": course_id}
+            )
+
+        # Save purchase (no second row if the course is already owned);
+        # the receipt job commits with it, or is dropped with it
+        enqueue(db, "payments.receipt", {"user_id": current_user.id, "course_id": course_id})
+        await grant_course_access(db, current_user.id, course_id)
 
-    # Basic fake validation
-    if len(card_number) < 12 or len(cvv) < 3:
         return templates.TemplateResponse(
-            "payment_failed.html",
+            "payment_success.html",
             {"request": request, "course_id": course_id}
         )
 
-    # Fake random approval / decline (50% chance)
-    approved = random.choice([True, False, True])  # slightly biased to approve
-
-    if not approved:
-        return templates.TemplateResponse(
-            "payment_failed.html",
-            {"request": request, "course_id": course_id}
-        )
-
-    # Save purchase
-    new_purchase = Purchase(
-        user_id=current_user.id,
-        course_id=course_id,
-        paid=True
-    )
-
-    db.add(new_purchase)
-    await db.commit()
-
-    return templates.TemplateResponse(
-        "payment_success.html",
-        {"request": request, "course_id": course_id}
-    )
+    return await idempotent(request, current_user.id, checkout)
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from ..database import get_db
-from ..models import Course, Purchase
+from ..database import get_db, get_read_db
+from ..models import Course
+from ..entitlements import grant_course_access
+from ..idempotency import idempotent, new_key
+from ..jobs import enqueue
 from ..auth import get_current_user
+from ..templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 
 # -----------------------------------------------------
@@ -19,7 +21,7 @@ templates = Jinja2Templates(directory="app/templates")
 async def payment_page(
     course_id: int,
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
 
@@ -34,7 +36,7 @@ async def payment_page(
 
     return templates.TemplateResponse(
         "payment.html",
-        {"request": request, "course": course, "user": current_user}
+        {"request": request, "course": course, "user": current_user, "idempotency_key": new_key()}
     )
 
 
@@ -52,16 +54,15 @@ async def process_payment(
     if not current_user:
         return RedirectResponse(f"/login?next=/payment/{course_id}", status_code=303)
 
-    purchase = Purchase(
-        user_id=current_user.id,
-        course_id=course_id,
-        paid=True
-    )
-
-    db.add(purchase)
-    await db.commit()
+    # Owning the course already, a double submit or a retry with the same
+    # idempotency key all end on the success page without a second row
+    async def checkout():
+        # The receipt job commits with the purchase, or is dropped with it
+        enqueue(db, "payments.receipt", {"user_id": current_user.id, "course_id": course_id})
+        await grant_course_access(db, current_user.id, course_id)
+        return templates.TemplateResponse(
+            "payment_success.html",
+            {"request": request, "course_id": course_id}
+        )
 
-    return templates.TemplateResponse(
-        "payment_success.html",
-        {"request": request, "course_id": course_id}
-    )
+    return await idempotent(request, current_user.id, checkout)
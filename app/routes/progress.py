@@ -0,0 +1,82 @@
+# app/routes/progress.py
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import get_current_user
+from ..content import get_lesson_body
+from ..database import get_read_db
+from ..entitlements import has_course_access
+from ..progress import get_course_progress, get_progress, progress_buffer
+from ..querystats import query_budget
+from ..schemas import ProgressIn, ProgressOut
+
+router = APIRouter(prefix="/progress", tags=["progress"])
+
+
+async def _accessible_lesson(db: AsyncSession, user, lesson_id: int):
+    if not user:
+        raise HTTPException(401, "Login required")
+    lesson = await get_lesson_body(db, lesson_id)
+    if not lesson:
+        raise HTTPException(404, "Lesson not found")
+    if not await has_course_access(db, user.id, lesson.course_id):
+        raise HTTPException(403, "Course not purchased")
+    return lesson
+
+
+# -------------------------
+# PING (from the video player, every few seconds)
+# -------------------------
+@router.post("/{lesson_id}", response_model=ProgressOut, status_code=202)
+@query_budget(3)
+async def record_progress(
+    lesson_id: int,
+    ping: ProgressIn,
+    db: AsyncSession = Depends(get_read_db),
+    current_user=Depends(get_current_user)
+):
+    """
+    Buffered, not written: pings are coalesced per user and lesson and
+    stored in batches (see app/progress.py). Lesson and entitlement come
+    from caches, so a ping normally costs no query. 503 while the
+    buffer is full (PROGRESS_MAX_BUFFERED, e.g. during a database outage).
+    """
+    lesson = await _accessible_lesson(db, current_user, lesson_id)
+    return progress_buffer.record(
+        current_user.id, lesson.id, lesson.course_id,
+        ping.position_seconds, ping.duration_seconds, ping.completed,
+    )
+
+
+# -------------------------
+# READ
+# -------------------------
+@router.get("/{lesson_id}", response_model=ProgressOut)
+@query_budget(4)
+async def lesson_progress(
+    lesson_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user=Depends(get_current_user)
+):
+    lesson = await _accessible_lesson(db, current_user, lesson_id)
+    progress = await get_progress(db, current_user.id, lesson.id, lesson.course_id)
+    if progress is None:
+        raise HTTPException(404, "Lesson not started")
+    return progress
+
+
+@router.get("/course/{course_id}", response_model=List[ProgressOut])
+@query_budget(3)
+async def course_progress(
+    course_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user=Depends(get_current_user)
+):
+    if not current_user:
+        raise HTTPException(401, "Login required")
+    if not await has_course_access(db, current_user.id, course_id):
+        raise HTTPException(403, "Course not purchased")
+    progress = await get_course_progress(db, current_user.id, course_id)
+    return sorted(progress.values(), key=lambda p: p.lesson_id)
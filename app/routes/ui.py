@@ -1,29 +1,77 @@
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from ..database import AsyncSessionLocal, get_db
-from ..models import Course, Purchase, Lesson
+from ..database import get_read_db
+from ..models import Course
 from ..auth import get_current_user
+from ..templating import templates
+from ..entitlements import get_owned_course_ids, has_course_access
+from ..catalog import catalog
+from ..content import get_lesson_body
+from ..search import search_service
+from ..crud import list_courses_page
+from ..pagination import CourseFilters, PageParams, course_filters, page_params
+from ..querystats import query_budget
+from ..settings import settings
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+
+
+def _catalog_context(request: Request, snapshot, courses, cursor, owned):
+    return {
+        "request": request,
+        "courses": courses,
+        "catalog_version": snapshot.version,
+        # the grid fragment is cached per page/filter combination
+        "page_key": request.url.query,
+        "next_page_url": request.url.include_query_params(cursor=cursor) if cursor else None,
+        "owned_course_ids": owned,
+    }
+
+
+async def _owned_courses(db: AsyncSession, user_id: int):
+    owned = await get_owned_course_ids(db, user_id)
+    if not owned:
+        return []
+
+    result = await db.execute(select(Course).where(Course.id.in_(owned)))
+    return result.scalars().all()
 
 
 # -----------------------------------------------------
 # PUBLIC — view courses
 # -----------------------------------------------------
 @router.get("/courses", response_class=HTMLResponse)
-async def courses_page(request: Request):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Course))
-        courses = result.scalars().all()
+@query_budget(3)
+async def courses_page(
+    request: Request,
+    q: str = "",
+    page: PageParams = Depends(page_params),
+    filters: CourseFilters = Depends(course_filters),
+    db: AsyncSession = Depends(get_read_db),
+    current_user=Depends(get_current_user)
+):
+    snapshot = await catalog.get()
 
-    return templates.TemplateResponse(
-        "courses.html",
-        {"request": request, "courses": courses}
-    )
+    if q.strip():
+        # Ranked search results: matching courses, then courses of matching lessons
+        courses, cursor = [], None
+        for hit in search_service.search(q[:200], limit=settings.PAGE_SIZE_MAX):
+            course = snapshot.by_id.get(hit["course_id"])
+            if course is not None and course not in courses and filters.matches(course):
+                courses.append(course)
+    else:
+        courses, cursor = await list_courses_page(page, filters, snapshot)
+
+    owned = await get_owned_course_ids(db, current_user and current_user.id)
+
+    context = _catalog_context(request, snapshot, courses, cursor, owned)
+    context["q"] = q
+    if q.strip():
+        context["page_key"] = (context["page_key"], search_service.generation)
+
+    return templates.TemplateResponse("courses.html", context)
 
 
 # -----------------------------------------------------
@@ -41,21 +89,16 @@ async def login_page(request: Request, next: str = "/dashboard"):
 # DASHBOARD — private
 # -----------------------------------------------------
 @router.get("/dashboard", response_class=HTMLResponse)
+@query_budget(3)
 async def dashboard(
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
     if not current_user:
         return RedirectResponse("/login?next=/dashboard", status_code=303)
 
-    result = await db.execute(
-        select(Course)
-        .join(Purchase)
-        .where(Purchase.user_id == current_user.id, Purchase.paid == True)
-    )
-
-    courses = result.scalars().all()
+    courses = await _owned_courses(db, current_user.id)
 
     return templates.TemplateResponse(
         "dashboard.html",
@@ -63,35 +106,46 @@ async def dashboard(
     )
 
 @router.get("/lesson/{lesson_id}", response_class=HTMLResponse)
-async def lesson_detail(request: Request, lesson_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Lesson).where(Lesson.id == lesson_id)
-    )
-    lesson = result.scalar_one_or_none()
+@query_budget(3)
+async def lesson_detail(request: Request, lesson_id: int, db: AsyncSession = Depends(get_read_db)):
+    lesson = await get_lesson_body(db, lesson_id)
 
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
 
-    return request.app.state.templates.TemplateResponse(
+    response = request.app.state.templates.TemplateResponse(
         "lesson_detail.html",
         {"request": request, "lesson": lesson}
     )
+    prefetch = lesson.prefetch_header()
+    if prefetch:
+        response.headers["Link"] = prefetch
+    return response
 
 @router.get("/")
-async def home(request: Request, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Course).where(Course.is_published == True))
-    courses = result.scalars().all()
+@query_budget(3)
+async def home(
+    request: Request,
+    page: PageParams = Depends(page_params),
+    filters: CourseFilters = Depends(course_filters),
+    db: AsyncSession = Depends(get_read_db),
+    current_user=Depends(get_current_user)
+):
+    snapshot = await catalog.get()
+    courses, cursor = await list_courses_page(page, filters, snapshot)
+    owned = await get_owned_course_ids(db, current_user and current_user.id)
 
     return request.app.state.templates.TemplateResponse(
         "index.html",
-        {"request": request, "courses": courses}
+        _catalog_context(request, snapshot, courses, cursor, owned)
     )
 
 @router.get("/course/{course_id}", response_class=HTMLResponse)
+@query_budget(3)
 async def course_detail(
     request: Request,
     course_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
     result = await db.execute(select(Course).where(Course.id == course_id))
@@ -103,14 +157,7 @@ async def course_detail(
     # Check if user purchased
     has_access = False
     if current_user:
-        p = await db.execute(
-            select(Purchase).where(
-                Purchase.course_id == course_id,
-                Purchase.user_id == current_user.id,
-                Purchase.paid == True
-            )
-        )
-        has_access = p.scalars().first() is not None
+        has_access = await has_course_access(db, current_user.id, course_id)
 
     return templates.TemplateResponse(
         "course_detail.html",
@@ -118,21 +165,17 @@ async def course_detail(
     )
 
 @router.get("/profile", response_class=HTMLResponse)
+@query_budget(3)
 async def user_profile(
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
     if not current_user:
         return RedirectResponse("/login?next=/profile")
 
     # Get purchased courses
-    result = await db.execute(
-        select(Course)
-        .join(Purchase)
-        .where(Purchase.user_id == current_user.id, Purchase.paid == True)
-    )
-    courses = result.scalars().all()
+    courses = await _owned_courses(db, current_user.id)
 
     return templates.TemplateResponse(
         "profile.html",
@@ -1,11 +1,10 @@
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from ..database import get_db
 from ..models import User
-from ..auth import get_password_hash, login_user
+from ..auth import hash_password, login_user, logout_user
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -24,7 +23,7 @@ async def register_user(email: str, password: str, db: AsyncSession = Depends(ge
 
     user = User(
     email=email,
-    hashed_password=get_password_hash(password)
+    hashed_password=await hash_password(password)
    )
 
 
@@ -52,6 +51,4 @@ async def login_user_route(request: Request, db: AsyncSession = Depends(get_db))
 # -------------------------
 @router.get("/logout")
 async def logout_route(request: Request):
-    response = RedirectResponse("/", status_code=303)
-    response.delete_cookie("session_token")
-    return response
+    return await logout_user(request)
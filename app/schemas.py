@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 
 class UserCreate(BaseModel):
@@ -23,5 +24,21 @@ class CourseBase(BaseModel):
 class CourseOut(CourseBase):
     id: int
     thumbnail_path: Optional[str]
+    thumbnail_srcset: Optional[str] = None
+    class Config:
+        from_attributes = True
+
+class ProgressIn(BaseModel):
+    position_seconds: float = Field(ge=0)
+    duration_seconds: Optional[float] = Field(None, gt=0)
+    completed: bool = False
+
+class ProgressOut(BaseModel):
+    lesson_id: int
+    position_seconds: float
+    duration_seconds: Optional[float]
+    completed: bool
+    completed_at: Optional[datetime]
+    updated_at: datetime
     class Config:
         from_attributes = True
@@ -0,0 +1,481 @@
+# app/search.py
+# -------------------------------------------------------
+# Full-text search over courses and lessons.
+#
+# An in-process inverted index, so it behaves the same on SQLite and
+# Azure SQL: BM25 ranking for /courses/search and prefix expansion of
+# the last word for typeahead. Courses are indexed on title and
+# description (both public); lessons on their title only, so paid
+# lesson text can't be probed through search and never sits in memory.
+#
+# The index is built from the database in the background at startup
+# and then kept current with deltas:
+#   - writes committed in this process are applied on after_commit
+#   - every Course/Lesson insert, delete or indexed-field update also
+#     records a search_changes row in the same transaction; each
+#     process polls those every SEARCH_SYNC_INTERVAL_SECONDS and
+#     reloads just the changed documents (a doc_type "all" row, written
+#     by the bulk importer, asks for a full rebuild instead)
+# -------------------------------------------------------
+
+import asyncio
+import heapq
+import math
+import re
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import timedelta
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from .database import AsyncSessionLocal
+from .jobs import utcnow
+from .models import Course, Lesson, SearchChange
+from .settings import settings
+
+DocKey = Tuple[str, int]    # ("course", id) / ("lesson", id)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+")
+
+TITLE_BOOST = 3         # title words count as this many occurrences
+K1 = 1.2
+B = 0.75
+MAX_PREFIX_TERMS = 64   # how many title words a typeahead prefix may expand to
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return _TOKEN_RE.findall(_TAG_RE.sub(" ", text).lower())
+
+
+@dataclass(frozen=True)
+class SearchDoc:
+    key: DocKey
+    title: str
+    body: Optional[str]
+    course_id: Optional[int]
+    published: bool = True
+
+    @classmethod
+    def from_course(cls, c) -> "SearchDoc":
+        return cls(("course", c.id), c.title, c.description, c.id, c.is_published is not False)
+
+    @classmethod
+    def from_lesson(cls, l) -> "SearchDoc":
+        # Title only: lesson bodies are paid content
+        return cls(("lesson", l.id), l.title, None, l.course_id)
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.postings: Dict[str, Dict[DocKey, int]] = {}
+        self.doc_len: Dict[DocKey, int] = {}
+        self.doc_terms: Dict[DocKey, Tuple[str, ...]] = {}
+        self.docs: Dict[DocKey, SearchDoc] = {}
+        self.total_len = 0
+        self.terms: List[str] = []      # sorted, for prefix lookups
+        # Title words only, for typeahead: much smaller postings than the
+        # body text, so a short prefix stays cheap.
+        self.title_postings: Dict[str, set] = {}
+        self.title_terms: List[str] = []
+        self._terms_sorted = True
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def add(self, doc: SearchDoc, bulk: bool = False) -> None:
+        self.remove(doc.key)
+
+        counts: Dict[str, int] = {}
+        for token in tokenize(doc.title):
+            counts[token] = counts.get(token, 0) + TITLE_BOOST
+        for token in tokenize(doc.body):
+            counts[token] = counts.get(token, 0) + 1
+
+        for term, tf in counts.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                if bulk:
+                    self.terms.append(term)
+                    self._terms_sorted = False
+                else:
+                    insort(self.terms, term)
+            posting[doc.key] = tf
+
+        for term in set(tokenize(doc.title)):
+            keys = self.title_postings.get(term)
+            if keys is None:
+                keys = self.title_postings[term] = set()
+                if bulk:
+                    self.title_terms.append(term)
+                else:
+                    insort(self.title_terms, term)
+            keys.add(doc.key)
+
+        length = sum(counts.values())
+        self.doc_len[doc.key] = length
+        self.doc_terms[doc.key] = tuple(counts)
+        self.docs[doc.key] = doc
+        self.total_len += length
+
+    def finish_bulk(self) -> None:
+        if not self._terms_sorted:
+            self.terms.sort()
+            self.title_terms.sort()
+            self._terms_sorted = True
+
+    def remove(self, key: DocKey) -> None:
+        terms = self.doc_terms.pop(key, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            posting = self.postings[term]
+            posting.pop(key, None)
+            if not posting:
+                del self.postings[term]
+                _discard_sorted(self.terms, term)
+
+        for term in set(tokenize(self.docs[key].title)):
+            keys = self.title_postings[term]
+            keys.discard(key)
+            if not keys:
+                del self.title_postings[term]
+                _discard_sorted(self.title_terms, term)
+
+        self.total_len -= self.doc_len.pop(key)
+        del self.docs[key]
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def expand_prefix(self, prefix: str, limit: int = MAX_PREFIX_TERMS, terms=None) -> List[str]:
+        terms = self.terms if terms is None else terms
+        start = bisect_left(terms, prefix)
+        found = []
+        for term in terms[start:start + limit]:
+            if not term.startswith(prefix):
+                break
+            found.append(term)
+        return found
+
+    def score(self, query: str) -> Dict[DocKey, float]:
+        scores: Dict[DocKey, float] = {}
+        if self.docs:
+            for term in tokenize(query):
+                self._accumulate(scores, term, self.postings.get(term))
+        return scores
+
+    def _accumulate(self, scores: Dict[DocKey, float], term: str, keys) -> None:
+        """Add term's BM25 contribution for each of `keys` to `scores`."""
+        posting = self.postings.get(term)
+        if not posting or not keys:
+            return
+
+        n_docs = len(self.docs)
+        avg_len = self.total_len / n_docs
+        idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+        for key in keys:
+            tf = posting[key]
+            norm = tf + K1 * (1 - B + B * self.doc_len[key] / avg_len)
+            scores[key] = scores.get(key, 0.0) + idf * tf * (K1 + 1) / norm
+
+    def search(self, query: str, limit: int = 20) -> List[dict]:
+        return self._top(self.score(query), limit)
+
+    def _top(self, scores: Dict[DocKey, float], limit: int) -> List[dict]:
+        # Partial top-k first; a full sort is only needed when hidden
+        # (unpublished) documents crowd out the top of the ranking.
+        ranked = heapq.nlargest(limit * 4, scores.items(), key=itemgetter(1))
+        results = self._collect(ranked, limit)
+        if len(results) < limit and len(ranked) < len(scores):
+            results = self._collect(sorted(scores.items(), key=itemgetter(1), reverse=True), limit)
+        return results
+
+    def _collect(self, ranked, limit: int) -> List[dict]:
+        results = []
+        for key, score in ranked:
+            doc = self.docs[key]
+            if not self._visible(doc):
+                continue
+            results.append({
+                "type": key[0],
+                "id": key[1],
+                "course_id": doc.course_id,
+                "title": doc.title,
+                "score": round(score, 4),
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+    def suggest(self, query: str, limit: int = 8) -> List[str]:
+        """
+        Typeahead: titles containing every query word, the last one as a
+        prefix. Candidates come from the title postings only, then are
+        ranked with the full BM25 weights.
+        """
+        tokens = tokenize(query)
+        if not tokens or not self.docs:
+            return []
+
+        candidates = set()
+        expansions = self.expand_prefix(tokens[-1], terms=self.title_terms)
+        for term in expansions:
+            candidates |= self.title_postings[term]
+        for term in tokens[:-1]:
+            candidates &= self.title_postings.get(term, set())
+
+        scores: Dict[DocKey, float] = {}
+        for term in (*tokens[:-1], *expansions):
+            self._accumulate(scores, term, candidates & self.title_postings[term])
+
+        titles = []
+        for hit in self._top(scores, limit * 3):
+            if hit["title"] not in titles:
+                titles.append(hit["title"])
+                if len(titles) >= limit:
+                    break
+        return titles
+
+    def _visible(self, doc: SearchDoc) -> bool:
+        # Hide unpublished courses and their lessons
+        course = self.docs.get(("course", doc.course_id))
+        return course is None or course.published
+
+
+def _discard_sorted(items: List[str], value: str) -> None:
+    i = bisect_left(items, value)
+    if i < len(items) and items[i] == value:
+        del items[i]
+
+
+# Only the columns SearchDoc uses; lesson bodies are never loaded
+COURSE_COLUMNS = (Course.id, Course.title, Course.description, Course.is_published)
+LESSON_COLUMNS = (Lesson.id, Lesson.title, Lesson.course_id)
+
+
+class SearchService:
+    def __init__(self, session_factory, sync_interval: int):
+        self._session_factory = session_factory
+        self._sync_interval = sync_interval
+        self.index = InvertedIndex()
+        self.ready = False
+        self.generation = 0     # bumped on every change, for cache keys
+        self._pending: Optional[list] = None    # ops seen while a rebuild runs
+        self._task: Optional[asyncio.Task] = None
+        self._synced_at = None                  # created_at up to which changes are applied
+        self._seen_changes: set = set()         # change ids inside the overlap window
+        self._last_cleanup = 0.0
+
+    def search(self, query: str, limit: int = 20) -> List[dict]:
+        return self.index.search(query, limit=limit)
+
+    def suggest(self, query: str, limit: int = 8) -> List[str]:
+        return self.index.suggest(query, limit=limit)
+
+    def apply(self, ops) -> None:
+        for op, payload in ops:
+            if op == "upsert":
+                self.index.add(payload)
+            else:
+                self.index.remove(payload)
+        self.generation += 1
+        if self._pending is not None:
+            self._pending.extend(ops)
+
+    async def rebuild(self) -> None:
+        """Build a fresh index from the database and swap it in."""
+        fresh = InvertedIndex()
+        self._pending = []
+        # Changes recorded from here on are replayed by the next sync
+        synced_at = utcnow()
+        try:
+            async with self._session_factory() as session:
+                for columns, to_doc in ((COURSE_COLUMNS, SearchDoc.from_course), (LESSON_COLUMNS, SearchDoc.from_lesson)):
+                    stream = await session.stream(select(*columns).execution_options(yield_per=1000))
+                    async for partition in stream.partitions():
+                        for row in partition:
+                            fresh.add(to_doc(row), bulk=True)
+                        await asyncio.sleep(0)  # let requests run between chunks
+
+            fresh.finish_bulk()
+
+            # Replay writes committed while we were reading
+            for op, payload in self._pending:
+                if op == "upsert":
+                    fresh.add(payload)
+                else:
+                    fresh.remove(payload)
+        finally:
+            self._pending = None
+
+        self.index = fresh
+        self.ready = True
+        self.generation += 1
+        self._synced_at = synced_at
+        self._seen_changes = set()
+
+    async def sync(self) -> int:
+        """Apply search_changes recorded since the last sync. Returns how many."""
+        # Re-read an overlap window: a change row becomes visible at
+        # commit, which can be later than its created_at, and replica
+        # clocks drift. Reloading a document twice is harmless.
+        since = self._synced_at - timedelta(seconds=settings.SEARCH_SYNC_OVERLAP_SECONDS)
+        polled_at = utcnow()
+        docs = []
+        async with self._session_factory() as session:
+            rows = (await session.execute(
+                select(SearchChange.id, SearchChange.doc_type, SearchChange.doc_id)
+                .where(SearchChange.created_at >= since)
+            )).all()
+            changes = [r for r in rows if r.id not in self._seen_changes]
+            course_ids = {r.doc_id for r in changes if r.doc_type == "course"}
+            lesson_ids = {r.doc_id for r in changes if r.doc_type == "lesson"}
+            rebuild = any(r.doc_type == "all" for r in changes)
+
+            if not rebuild and course_ids:
+                docs += [SearchDoc.from_course(r) for r in (await session.execute(
+                    select(*COURSE_COLUMNS).where(Course.id.in_(course_ids)))).all()]
+            if not rebuild and lesson_ids:
+                docs += [SearchDoc.from_lesson(r) for r in (await session.execute(
+                    select(*LESSON_COLUMNS).where(Lesson.id.in_(lesson_ids)))).all()]
+
+        if rebuild:
+            await self.rebuild()
+        elif changes:
+            found = {d.key for d in docs}
+            gone = {("course", i) for i in course_ids} | {("lesson", i) for i in lesson_ids}
+            self.apply([("upsert", d) for d in docs] + [("remove", key) for key in gone - found])
+            self._synced_at = polled_at
+        else:
+            self._synced_at = polled_at
+        self._seen_changes = {r.id for r in rows}
+        return len(changes)
+
+    async def _cleanup(self) -> None:
+        # At most once an hour per process
+        if time.monotonic() - self._last_cleanup < 3600:
+            return
+        self._last_cleanup = time.monotonic()
+        cutoff = utcnow() - timedelta(hours=settings.SEARCH_CHANGE_RETENTION_HOURS)
+        async with self._session_factory() as session:
+            await session.execute(
+                delete(SearchChange).where(SearchChange.created_at < cutoff)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if not self.ready:
+                    await self.rebuild()
+                elif self._sync_interval:
+                    await self.sync()
+                    await self._cleanup()
+            except Exception as e:
+                print("SEARCH INDEX ERROR:", e)
+            if self.ready and not self._sync_interval:
+                return
+            await asyncio.sleep(self._sync_interval or 5)
+
+
+search_service = SearchService(AsyncSessionLocal, settings.SEARCH_SYNC_INTERVAL_SECONDS)
+
+
+# -------------------------------------------------------
+# Keep the index current for writes committed in this process
+# -------------------------------------------------------
+@event.listens_for(Session, "after_flush")
+def _collect_search_changes(session, flush_context):
+    ops = session.info.setdefault("search_ops", [])
+
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Course):
+            ops.append(("upsert", SearchDoc.from_course(obj)))
+        elif isinstance(obj, Lesson):
+            ops.append(("upsert", SearchDoc.from_lesson(obj)))
+
+    for obj in session.deleted:
+        if isinstance(obj, Course):
+            ops.append(("remove", ("course", obj.id)))
+        elif isinstance(obj, Lesson):
+            ops.append(("remove", ("lesson", obj.id)))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_search_changes(session):
+    ops = session.info.pop("search_ops", None)
+    if ops:
+        search_service.apply(ops)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_search_changes(session):
+    session.info.pop("search_ops", None)
+
+
+# -------------------------------------------------------
+# Record changes for the other processes, in the writing transaction
+# -------------------------------------------------------
+COURSE_INDEXED = ("title", "description", "is_published")
+LESSON_INDEXED = ("title", "course_id")
+
+
+def _record_change(connection, doc_type: str, doc_id: int) -> None:
+    connection.execute(
+        insert(SearchChange.__table__).values(doc_type=doc_type, doc_id=doc_id, created_at=utcnow())
+    )
+
+
+def _indexed_change(target, fields) -> bool:
+    attrs = inspect(target).attrs
+    return any(attrs[name].history.has_changes() for name in fields)
+
+
+@event.listens_for(Course, "after_insert")
+@event.listens_for(Course, "after_delete")
+def _record_course(mapper, connection, target):
+    _record_change(connection, "course", target.id)
+
+
+@event.listens_for(Course, "after_update")
+def _record_course_update(mapper, connection, target):
+    if _indexed_change(target, COURSE_INDEXED):
+        _record_change(connection, "course", target.id)
+
+
+@event.listens_for(Lesson, "after_insert")
+@event.listens_for(Lesson, "after_delete")
+def _record_lesson(mapper, connection, target):
+    _record_change(connection, "lesson", target.id)
+
+
+@event.listens_for(Lesson, "after_update")
+def _record_lesson_update(mapper, connection, target):
+    if _indexed_change(target, LESSON_INDEXED):
+        _record_change(connection, "lesson", target.id)
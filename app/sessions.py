@@ -0,0 +1,307 @@
+# app/sessions.py
+# -------------------------------------------------------
+# Server-side sessions.
+#
+# The cookie holds only a random session id; the data lives in a
+# SessionStore chosen by SESSION_BACKEND:
+#   memory  in-process LRU (one process; local development)
+#   file    one JSON file per session under SESSION_FILE_DIR (a local
+#           stand-in for tests, or shared by replicas on a shared volume)
+#   redis   SESSION_REDIS_URL, shared by all replicas (needs `redis`)
+#
+# Nothing is signed or re-encoded per request. The store is written only
+# when a handler changes the session, plus a sliding-expiry refresh at
+# most every SESSION_REFRESH_SECONDS, and the cookie is only sent when
+# one of those happens. Clearing the session deletes it from the store,
+# so logging out revokes the id everywhere.
+# -------------------------------------------------------
+
+import asyncio
+import json
+import os
+import re
+import secrets
+import time
+from abc import ABC, abstractmethod
+from http.cookies import SimpleCookie
+from typing import Optional, Tuple
+
+from .cache import TTLCache
+from .settings import settings
+
+SessionRecord = Tuple[dict, float]      # (data, refreshed_at)
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(32)
+
+
+class SessionData(dict):
+    """The dict behind request.session; tracks whether it was changed."""
+
+    def __init__(self, data=None):
+        super().__init__(data or {})
+        self.modified = False
+        self.regenerate_id = False
+
+    def regenerate(self) -> None:
+        """Move the session to a fresh id (call on login, against fixation)."""
+        self.regenerate_id = True
+        self.modified = True
+
+    def _changed(method):
+        def wrapper(self, *args, **kwargs):
+            self.modified = True
+            return method(self, *args, **kwargs)
+        wrapper.__name__ = method.__name__
+        return wrapper
+
+    __setitem__ = _changed(dict.__setitem__)
+    __delitem__ = _changed(dict.__delitem__)
+    clear = _changed(dict.clear)
+    pop = _changed(dict.pop)
+    popitem = _changed(dict.popitem)
+    setdefault = _changed(dict.setdefault)
+    update = _changed(dict.update)
+    del _changed
+
+
+# -------------------------------------------------------
+# Stores
+# -------------------------------------------------------
+class SessionStore(ABC):
+    def __init__(self, max_age: int):
+        self.max_age = max_age
+
+    @abstractmethod
+    async def load(self, session_id: str) -> Optional[SessionRecord]:
+        ...
+
+    @abstractmethod
+    async def save(self, session_id: str, data: dict) -> None:
+        """Store `data` and restart its expiry."""
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, max_age: int, maxsize: int):
+        super().__init__(max_age)
+        self._cache = TTLCache(maxsize=maxsize, ttl=max_age)
+
+    async def load(self, session_id):
+        record = self._cache.get(session_id)
+        if record is None:
+            return None
+        data, refreshed_at = record
+        return dict(data), refreshed_at
+
+    async def save(self, session_id, data):
+        self._cache.set(session_id, (dict(data), time.time()))
+
+    async def delete(self, session_id):
+        self._cache.invalidate(session_id)
+
+
+class FileSessionStore(SessionStore):
+    """
+    Session files named after the id. The file's mtime is the refresh
+    time; stale files are removed when read (or by any periodic cleanup
+    of SESSION_FILE_DIR).
+    """
+
+    def __init__(self, max_age: int, directory: str):
+        super().__init__(max_age)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, session_id + ".json")
+
+    def _load(self, session_id):
+        path = self._path(session_id)
+        try:
+            refreshed_at = os.stat(path).st_mtime
+            if refreshed_at + self.max_age < time.time():
+                os.unlink(path)
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f), refreshed_at
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, session_id, data):
+        # Write then rename, so a concurrent reader never sees half a file
+        # Unique temp name: two requests on one session can save at once
+        path = self._path(session_id)
+        tmp = f"{path}.{secrets.token_hex(8)}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _delete(self, session_id):
+        try:
+            os.unlink(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    async def load(self, session_id):
+        return await asyncio.to_thread(self._load, session_id)
+
+    async def save(self, session_id, data):
+        await asyncio.to_thread(self._save, session_id, data)
+
+    async def delete(self, session_id):
+        await asyncio.to_thread(self._delete, session_id)
+
+
+class RedisSessionStore(SessionStore):
+    def __init__(self, max_age: int, url: str):
+        super().__init__(max_age)
+        # Imported here so the package is only needed when this store is used
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+
+    @staticmethod
+    def _key(session_id):
+        return f"session:{session_id}"
+
+    async def load(self, session_id):
+        raw = await self._redis.get(self._key(session_id))
+        if raw is None:
+            return None
+        try:
+            record = json.loads(raw)
+            return record["data"], record["refreshed_at"]
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    async def save(self, session_id, data):
+        record = json.dumps({"data": data, "refreshed_at": time.time()})
+        await self._redis.set(self._key(session_id), record, ex=self.max_age)
+
+    async def delete(self, session_id):
+        await self._redis.delete(self._key(session_id))
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        backend = settings.SESSION_BACKEND
+        max_age = settings.SESSION_MAX_AGE_SECONDS
+        if backend == "memory":
+            _store = MemorySessionStore(max_age, settings.SESSION_MEMORY_MAX_ENTRIES)
+        elif backend == "file":
+            _store = FileSessionStore(max_age, settings.SESSION_FILE_DIR)
+        elif backend == "redis":
+            _store = RedisSessionStore(max_age, settings.SESSION_REDIS_URL)
+        else:
+            raise ValueError(f"Unknown SESSION_BACKEND {backend!r}")
+    return _store
+
+
+async def close_session_store() -> None:
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
+
+
+# -------------------------------------------------------
+# Middleware
+# -------------------------------------------------------
+class ServerSessionMiddleware:
+    """
+    Pure ASGI replacement for Starlette's SessionMiddleware: provides
+    request.session for every path except `exclude_prefixes`.
+    """
+
+    def __init__(self, app, cookie_name: str = "sid", max_age: int = 14 * 24 * 3600,
+                 refresh_after: int = 3600, same_site: str = "lax", https_only: bool = False,
+                 exclude_prefixes: tuple = ()):
+        self.app = app
+        self.cookie_name = cookie_name
+        self.max_age = max_age
+        self.refresh_after = refresh_after
+        self.exclude_prefixes = exclude_prefixes
+        flags = f"path=/; httponly; samesite={same_site}"
+        if https_only:
+            flags += "; secure"
+        self._flags = flags
+
+    def _session_id(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookie = SimpleCookie()
+                try:
+                    cookie.load(value.decode("latin-1"))
+                except Exception:
+                    return None
+                morsel = cookie.get(self.cookie_name)
+                if morsel is not None and _SESSION_ID_RE.match(morsel.value):
+                    return morsel.value
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        store = get_session_store()
+        session_id = self._session_id(scope)
+        record = await store.load(session_id) if session_id else None
+        if record is None:
+            session, refreshed_at = SessionData(), 0.0
+        else:
+            session, refreshed_at = SessionData(record[0]), record[1]
+        scope["session"] = session
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                cookie = await self._commit(store, session_id, session, refreshed_at, record is not None)
+                if cookie is not None:
+                    message.setdefault("headers", [])
+                    message["headers"].append((b"set-cookie", cookie.encode("latin-1")))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _commit(self, store, session_id, session, refreshed_at, existed) -> Optional[str]:
+        """Persist changes; returns the Set-Cookie value to send, if any."""
+        if session.modified:
+            if not session:
+                if existed:
+                    await store.delete(session_id)
+                    return f"{self.cookie_name}=; max-age=0; {self._flags}"
+                return None
+            if session.regenerate_id or not existed:
+                if existed:
+                    await store.delete(session_id)
+                session_id = new_session_id()
+            await store.save(session_id, dict(session))
+            return f"{self.cookie_name}={session_id}; max-age={self.max_age}; {self._flags}"
+
+        # Unchanged: only slide the expiry now and then
+        if existed and time.time() - refreshed_at > self.refresh_after:
+            await store.save(session_id, dict(session))
+            return f"{self.cookie_name}={session_id}; max-age={self.max_age}; {self._flags}"
+        return None
@@ -5,20 +5,111 @@ class Settings(BaseSettings):
     SESSION_SECRET: str = "super-secret-local-key-123456789"
     ENV: str = "local"  
 
+    # --- SESSIONS (server-side, see sessions.py) ---
+    SESSION_BACKEND: str = "memory"            # memory | file | redis (redis for several replicas)
+    SESSION_REDIS_URL: str | None = None
+    SESSION_FILE_DIR: str = "build/sessions"
+    SESSION_MEMORY_MAX_ENTRIES: int = 100000
+    SESSION_COOKIE_NAME: str = "sid"
+    SESSION_COOKIE_SECURE: bool = False
+    SESSION_MAX_AGE_SECONDS: int = 14 * 24 * 3600
+    SESSION_REFRESH_SECONDS: int = 3600        # sliding expiry is written at most this often
+
     # --- DATABASE CONFIG (SQLite locally, Azure SQL in cloud) ---
     DATABASE_URL: str = "sqlite+aiosqlite:///./learning_platform.db"
     AZURE_SQL_CONNECTION_STRING: str | None = None   # <-- FIXED
 
+    # --- CONNECTION POOL (server databases; SQLite uses the default) ---
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 10.0        # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1500          # below Azure SQL's 30 min idle timeout
+    DB_POOL_PRE_PING: bool = False       # disconnects are handled when they happen
+    DB_POOL_WARMUP: int | None = None    # connections opened at startup; None = pool size
+    DB_CREATE_ALL: bool | None = None    # create missing tables at startup; None = outside production
+
+    # --- READ REPLICA (optional; read-only routes use it via get_read_db) ---
+    DATABASE_READ_URL: str | None = None
+    DB_READ_STICKY_SECONDS: int = 10     # reads stay on the primary this long after a write
+
     # --- AZURE STORAGE ---
     AZURE_STORAGE_CONNECTION_STRING: str | None = None
     AZURE_STORAGE_ACCOUNT_NAME: str | None = None
     AZURE_STORAGE_ACCOUNT_KEY: str | None = None
     AZURE_STORAGE_CONTAINER: str | None = None
     AZURE_BLOB_CONTAINER: str | None = None
+    AZURE_STORAGE_CDN_URL: str | None = None
+
+    # --- UPLOADS (local backend is used when Azure is not configured) ---
+    LOCAL_STORAGE_DIR: str = "app/static/uploads"
+    LOCAL_STORAGE_URL: str = "/static/uploads"
+    STORAGE_CHUNK_SIZE: int = 1024 * 1024          # read size for incoming uploads
+    STORAGE_BLOCK_SIZE: int = 4 * 1024 * 1024      # Azure block size
+    STORAGE_MAX_CONCURRENCY: int = 4               # parallel block uploads per file
+
+    # --- STATIC ASSETS (fingerprint manifest + gzip/brotli copies) ---
+    ASSET_BUILD_DIR: str = "build/assets"
+
+    # --- TEMPLATES ---
+    TEMPLATE_BYTECODE_CACHE_DIR: str | None = "build/jinja"
+    TEMPLATE_FRAGMENT_CACHE_SIZE: int = 512
+    TEMPLATE_FRAGMENT_CACHE_TTL_SECONDS: int = 3600
+
+    # --- PAGINATION ---
+    PAGE_SIZE_DEFAULT: int = 24
+    PAGE_SIZE_MAX: int = 100
+
+    # --- SEARCH ---
+    SEARCH_SYNC_INTERVAL_SECONDS: int = 10        # poll search_changes for other replicas' writes; 0 = build once
+    SEARCH_SYNC_OVERLAP_SECONDS: int = 60         # re-read window for late commits and clock skew
+    SEARCH_CHANGE_RETENTION_HOURS: int = 24
+
+    # --- QUERY STATS (see querystats.py) ---
+    QUERY_REPEAT_THRESHOLD: int = 5         # same statement shape this often = likely N+1
+    QUERY_BUDGET_DEFAULT: int | None = None # statements per request when a route sets none
+    QUERY_BUDGET_ENFORCE: bool = False      # answer 500 over budget (turn on in tests)
+
+    # --- BULK ENROLLMENT (POST /enrollments/bulk) ---
+    ADMIN_API_TOKEN: str | None = None      # X-Admin-Token for admin APIs; unset = disabled
+    ENROLLMENT_BATCH_SIZE: int = 1000       # rows per transaction (keep under 2100 SQL Server params)
+
+    # --- IDEMPOTENT CHECKOUT (see idempotency.py) ---
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+
+    # --- BACKGROUND JOBS (see jobs.py) ---
+    JOB_WORKERS: int = 2                       # worker tasks per process; 0 = enqueue only
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0     # local enqueues wake the workers sooner
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 300  # run-time limit; then another worker may retry
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BACKOFF_SECONDS: float = 10.0    # doubled per attempt, capped at an hour
+    JOB_RETENTION_HOURS: int = 72              # finished jobs kept this long
+    JOB_SHUTDOWN_GRACE_SECONDS: float = 10.0
+
+    # --- LESSON PROGRESS (write-behind buffer, see progress.py) ---
+    PROGRESS_FLUSH_INTERVAL_SECONDS: float = 5.0
+    PROGRESS_FLUSH_MAX_PENDING: int = 1000     # flush early once this many (user, lesson) wait
+    PROGRESS_MAX_BUFFERED: int = 100000        # hard limit; pings for new (user, lesson) get 503
+    PROGRESS_FLUSH_MAX_ATTEMPTS: int = 12      # failed flushes before an entry is dropped (~1 min)
+    PROGRESS_COMPLETE_RATIO: float = 0.9       # watched this share of the video = completed
 
     # --- KEY VAULT ---
     KEY_VAULT_URL: str | None = None
 
+    # --- REQUEST-SCOPED CACHES ---
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    ENTITLEMENT_CACHE_TTL_SECONDS: int = 300
+    ENTITLEMENT_CACHE_MAX_ENTRIES: int = 10000
+    LESSON_CACHE_TTL_SECONDS: int = 600        # rendered lesson bodies (content.py)
+    LESSON_CACHE_MAX_ENTRIES: int = 2000
+    CATALOG_MAX_AGE_SECONDS: int = 300
+
+    # --- PASSWORD HASHING ---
+    PASSWORD_HASH_WORKERS: int | None = None   # None = cores in the CPU limit, 0 = inline
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 5.0
+
     class Config:
         env_file = ".env"
 
@@ -1,75 +1,267 @@
-from azure.storage.blob import BlobServiceClient
-from app.settings import settings
-import uuid
+# app/storage.py
+# -------------------------------------------------------
+# Blob storage for uploaded files.
+#
+# One long-lived backend per process (get_storage()):
+#   - AzureBlobStorage: async SDK client whose HTTP session is pooled
+#     and reused; large files are uploaded as blocks in parallel.
+#   - LocalFileStorage: same interface on the local disk, used when no
+#     Azure account is configured (local dev, tests, benchmarks).
+#
+# Uploads are streamed chunk by chunk, so memory use depends on the
+# block size and concurrency, never on the file size.
+# -------------------------------------------------------
+
+import asyncio
+import base64
+import functools
 import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
 
-def get_blob_client():
-    if not settings.AZURE_STORAGE_ACCOUNT_NAME:
-        raise RuntimeError("Azure Storage not configured")
+import aiofiles
 
-    connection_str = (
-        f"DefaultEndpointsProtocol=https;"
-        f"AccountName={settings.AZURE_STORAGE_ACCOUNT_NAME};"
-        f"AccountKey={settings.AZURE_STORAGE_ACCOUNT_KEY};"
-        f"EndpointSuffix=core.windows.net"
-    )
+from app.metrics import STORAGE_UPLOAD_BYTES, STORAGE_UPLOAD_SECONDS
+from app.settings import settings
 
-    service_client = BlobServiceClient.from_connection_string(connection_str)
-    container_client = service_client.get_container_client(settings.AZURE_STORAGE_CONTAINER)
-    return container_client
 
+async def iter_upload(file, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Yield an UploadFile (or any object with async read(n)) in chunks."""
+    chunk_size = chunk_size or settings.STORAGE_CHUNK_SIZE
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
 
-async def upload_file_to_blob(file, folder="uploads"):
-    """
-    Uploads a file to blob storage and returns its public URL.
-    """
-    container = get_blob_client()
 
-    ext = file.filename.split(".")[-1]
-    blob_name = f"{folder}/{uuid.uuid4()}.{ext}"
+def _timed_upload(backend: str):
+    """Record upload duration and bytes per backend (storage_upload_* metrics)."""
+    uploaded_bytes = STORAGE_UPLOAD_BYTES.labels(backend)
+
+    async def counted(chunks):
+        async for chunk in chunks:
+            uploaded_bytes.inc(len(chunk))
+            yield chunk
+
+    def decorate(upload):
+        @functools.wraps(upload)
+        async def timed(self, chunks, *args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                url = await upload(self, counted(chunks), *args, **kwargs)
+                outcome = "ok"
+                return url
+            finally:
+                STORAGE_UPLOAD_SECONDS.labels(backend, outcome).observe(time.perf_counter() - started)
+        return timed
+    return decorate
+
+
+class BlobStorage(ABC):
+    @abstractmethod
+    async def upload(self, chunks: AsyncIterator[bytes], name: str,
+                     content_type: Optional[str] = None) -> str:
+        """Store the streamed bytes under `name` and return its public URL."""
+
+    @abstractmethod
+    async def read(self, name: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def url(self, name: str) -> str:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+# -----------------------------
+# Azure Blob Storage
+# -----------------------------
+class AzureBlobStorage(BlobStorage):
+    def __init__(self, connection_string: str, container: str,
+                 block_size: int, max_concurrency: int, cdn_url: Optional[str] = None):
+        # The Azure SDK takes ~0.2s to import; only pay for it when Azure
+        # storage is actually configured
+        from azure.storage.blob.aio import BlobServiceClient
+
+        self._service = BlobServiceClient.from_connection_string(connection_string)
+        self._container = self._service.get_container_client(container)
+        self.block_size = block_size
+        self.max_concurrency = max_concurrency
+        self.cdn_url = cdn_url.rstrip("/") if cdn_url else None
+
+    def url(self, name: str) -> str:
+        if self.cdn_url:
+            return f"{self.cdn_url}/{name}"
+        return f"{self._container.url}/{name}"
+
+    @_timed_upload("azure")
+    async def upload(self, chunks, name, content_type=None):
+        blob = self._container.get_blob_client(name)
+        from azure.storage.blob import ContentSettings
+
+        content_settings = ContentSettings(content_type=content_type) if content_type else None
+
+        buffer = bytearray()
+        block_ids = []
+        in_flight = set()
+        failures = []
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def stage(block_id, data):
+            try:
+                await blob.stage_block(block_id, data)
+            finally:
+                slots.release()
+
+        def settled(task):
+            # Keep a failed block's error; it must fail the upload, not
+            # surface later as a commit_block_list error
+            in_flight.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                failures.append(task.exception())
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                while len(buffer) >= self.block_size:
+                    data = bytes(buffer[:self.block_size])
+                    del buffer[:self.block_size]
 
-    blob_client = container.get_blob_client(blob_name)
+                    block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+                    block_ids.append(block_id)
 
-    # Read file content
-    content = await file.read()
+                    await slots.acquire()
+                    if failures:
+                        slots.release()
+                        raise failures[0]
+                    task = asyncio.create_task(stage(block_id, data))
+                    in_flight.add(task)
+                    task.add_done_callback(settled)
 
-    # Upload
-    blob_client.upload_blob(content, overwrite=True)
+            if not block_ids:
+                # Small file: a single Put Blob request
+                await blob.upload_blob(bytes(buffer), overwrite=True, content_settings=content_settings)
+                return self.url(name)
 
-    # Return public URL
-    if settings.AZURE_STORAGE_CDN_URL:
-        return f"{settings.AZURE_STORAGE_CDN_URL}/{blob_name}"
-    else:
+            if buffer:
+                block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+                block_ids.append(block_id)
+                await slots.acquire()
+                await stage(block_id, bytes(buffer))
+
+            await asyncio.gather(*list(in_flight))
+            if failures:
+                raise failures[0]
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            raise
+
+        await blob.commit_block_list(block_ids, content_settings=content_settings)
+        return self.url(name)
+
+    async def read(self, name: str) -> bytes:
+        downloader = await self._container.get_blob_client(name).download_blob()
+        return await downloader.readall()
+
+    async def close(self) -> None:
+        await self._service.close()
+
+
+# -----------------------------
+# Local filesystem
+# -----------------------------
+class LocalFileStorage(BlobStorage):
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, name: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, name))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Invalid blob name: {name}")
+        return path
+
+    def url(self, name: str) -> str:
+        return f"{self.base_url}/{name}"
+
+    @_timed_upload("local")
+    async def upload(self, chunks, name, content_type=None):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            async with aiofiles.open(tmp_path, "wb") as out:
+                async for chunk in chunks:
+                    await out.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return self.url(name)
+
+    async def read(self, name: str) -> bytes:
+        async with aiofiles.open(self._path(name), "rb") as f:
+            return await f.read()
+
+
+# -----------------------------
+# Process-wide backend
+# -----------------------------
+_storage: Optional[BlobStorage] = None
+
+
+def _azure_connection_string() -> Optional[str]:
+    if settings.AZURE_STORAGE_CONNECTION_STRING:
+        return settings.AZURE_STORAGE_CONNECTION_STRING
+    if settings.AZURE_STORAGE_ACCOUNT_NAME and settings.AZURE_STORAGE_ACCOUNT_KEY:
         return (
-            f"https://{settings.AZURE_STORAGE_ACCOUNT_NAME}.blob.core.windows.net/"
-            f"{settings.AZURE_STORAGE_CONTAINER}/{blob_name}"
+            f"DefaultEndpointsProtocol=https;"
+            f"AccountName={settings.AZURE_STORAGE_ACCOUNT_NAME};"
+            f"AccountKey={settings.AZURE_STORAGE_ACCOUNT_KEY};"
+            f"EndpointSuffix=core.windows.net"
         )
+    return None
+
+
+def get_storage() -> BlobStorage:
+    global _storage
+    if _storage is None:
+        conn = _azure_connection_string()
+        if conn:
+            _storage = AzureBlobStorage(
+                conn,
+                container=settings.AZURE_STORAGE_CONTAINER or settings.AZURE_BLOB_CONTAINER,
+                block_size=settings.STORAGE_BLOCK_SIZE,
+                max_concurrency=settings.STORAGE_MAX_CONCURRENCY,
+                cdn_url=settings.AZURE_STORAGE_CDN_URL,
+            )
+        else:
+            _storage = LocalFileStorage(settings.LOCAL_STORAGE_DIR, settings.LOCAL_STORAGE_URL)
+    return _storage
+
+
+async def close_storage() -> None:
+    global _storage
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
+
 
+async def upload_file_to_blob(file, folder="uploads"):
+    """
+    Uploads a file to blob storage and returns its public URL.
+    """
+    ext = file.filename.split(".")[-1]
+    blob_name = f"{folder}/{uuid.uuid4()}.{ext}"
 
-# import os
-# from azure.storage.blob import BlobServiceClient
-# from .config import settings
-
-# def get_blob_service():
-#     conn = settings.AZURE_STORAGE_CONNECTION_STRING
-#     if not conn:
-#         return None
-#     return BlobServiceClient.from_connection_string(conn)
-
-# def upload_blob(file_path: str, blob_name: str):
-#     client = get_blob_service()
-#     if not client:
-#         dest = os.path.join('app', 'static', 'thumbnails', blob_name)
-#         os.makedirs(os.path.dirname(dest), exist_ok=True)
-#         with open(file_path, 'rb') as src, open(dest, 'wb') as dst:
-#             dst.write(src.read())
-#         return f'/static/thumbnails/{blob_name}'
-#     container = client.get_container_client(settings.AZURE_STORAGE_CONTAINER)
-#     try:
-#         container.create_container()
-#     except Exception:
-#         pass
-#     blob_client = container.get_blob_client(blob_name)
-#     with open(file_path, 'rb') as data:
-#         blob_client.upload_blob(data, overwrite=True)
-#     return blob_client.url
+    return await get_storage().upload(iter_upload(file), blob_name, content_type=file.content_type)
@@ -0,0 +1,81 @@
+# app/thumbnails.py
+# -------------------------------------------------------
+# Thumbnail derivative pipeline.
+#
+# After an upload the original is stored as-is and the request returns;
+# a "thumbnails.generate" job (see jobs.py) then writes the resized
+# variants next to the original through the storage backend and records
+# their URLs on Course.thumbnail_variants. Failures are retried.
+#
+#   python -m app.thumbnails   # derive variants for app/static/images
+# -------------------------------------------------------
+
+import asyncio
+import os
+
+from sqlalchemy import select
+
+from .database import AsyncSessionLocal
+from .jobs import job_handler
+from .images import DERIVED_IMAGE_DIR, STATIC_IMAGE_DIR, render_variants, variant_name
+from .models import Course
+from .storage import get_storage
+
+
+async def _single_chunk(data: bytes):
+    yield data
+
+
+async def generate_course_thumbnails(course_id: int, blob_name: str) -> None:
+    storage = get_storage()
+
+    original = await storage.read(blob_name)
+    rendered = await asyncio.to_thread(render_variants, original)
+
+    variants = {}
+    for width, data in rendered.items():
+        url = await storage.upload(
+            _single_chunk(data), variant_name(blob_name, width), content_type="image/webp"
+        )
+        variants[str(width)] = url
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Course).where(Course.id == course_id))
+        course = result.scalar_one_or_none()
+
+        # Skip if the thumbnail was replaced while we were working
+        if course is None or course.thumbnail_path != storage.url(blob_name):
+            return
+
+        course.thumbnail_variants = variants
+        await db.commit()
+
+
+@job_handler("thumbnails.generate")
+async def _generate_thumbnails_job(payload: dict) -> None:
+    await generate_course_thumbnails(payload["course_id"], payload["blob_name"])
+
+
+def generate_static_thumbnails() -> int:
+    """Write variants of the bundled course images to the derived/ folder."""
+    os.makedirs(DERIVED_IMAGE_DIR, exist_ok=True)
+
+    count = 0
+    for name in sorted(os.listdir(STATIC_IMAGE_DIR)):
+        source = os.path.join(STATIC_IMAGE_DIR, name)
+        if not os.path.isfile(source):
+            continue
+
+        with open(source, "rb") as f:
+            rendered = render_variants(f.read())
+
+        for width, data in rendered.items():
+            with open(os.path.join(DERIVED_IMAGE_DIR, variant_name(name, width)), "wb") as out:
+                out.write(data)
+            count += 1
+
+    return count
+
+
+if __name__ == "__main__":
+    print(f"Wrote {generate_static_thumbnails()} thumbnail variants to {DERIVED_IMAGE_DIR}")
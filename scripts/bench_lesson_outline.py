@@ -0,0 +1,174 @@
+"""
+Lesson list benchmark: full Lesson rows vs the outline projection.
+
+Builds a throwaway SQLite database with courses of many large lessons
+and times one lessons-page view (a page of PAGE_SIZE_MAX lessons) two
+ways:
+
+  full     select(Lesson) ... the old list_lessons_page (every body and
+           video URL is fetched and turned into ORM objects)
+  outline  crud.list_lesson_outline (id, title, position rows)
+
+For each it reports latency percentiles, the bytes fetched from the
+database per page, and the peak Python memory allocated per page
+(tracemalloc). On Azure SQL the byte column is what crosses the network.
+
+    python scripts/bench_lesson_outline.py
+    python scripts/bench_lesson_outline.py --lessons 800 --body-kb 50 --runs 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def build(engine, args):
+    from sqlalchemy import insert
+    from app.database import Base
+    from app.models import Course, Lesson
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Course), [
+            {"id": c, "title": f"Course {c}", "price_cents": 0, "is_published": True}
+            for c in range(1, args.courses + 1)
+        ])
+        rng = random.Random(7)
+        body = "".join(rng.choice("abcdefghij klmnop\n") for _ in range(args.body_kb * 1024))
+        for c in range(1, args.courses + 1):
+            await conn.execute(insert(Lesson), [
+                {
+                    "course_id": c,
+                    "position": n,
+                    "title": f"Lesson {n}: {body[n:n + 40].strip()}",
+                    "content": body,
+                    "video_url": f"https://www.youtube.com/watch?v=vid{c}x{n}",
+                }
+                for n in range(1, args.lessons + 1)
+            ])
+
+
+async def full_page(db, course_id, params):
+    from sqlalchemy import select
+    from app.models import Lesson
+    from app.pagination import next_cursor
+
+    stmt = select(Lesson).where(Lesson.course_id == course_id)
+    if params.after_id is not None:
+        stmt = stmt.where(Lesson.id > params.after_id)
+    rows = (await db.execute(stmt.order_by(Lesson.position, Lesson.id).limit(params.limit + 1))).scalars().all()
+    return rows[:params.limit], next_cursor(rows, params.limit)
+
+
+async def outline_page(db, course_id, params):
+    from app.crud import list_lesson_outline
+    return await list_lesson_outline(db, course_id, params)
+
+
+def fetched_bytes(rows):
+    total = 0
+    for row in rows:
+        values = [getattr(row, k) for k in ("id", "title", "position", "course_id", "content", "video_url")
+                  if hasattr(row, k)]
+        total += sum(len(v) if isinstance(v, str) else 8 for v in values if v is not None)
+    return total
+
+
+async def measure(name, fetch, session_factory, args):
+    from app.pagination import PageParams
+
+    rng = random.Random(1)
+    params = PageParams(after_id=None, limit=args.page_size)
+    latencies, peaks, sizes = [], [], []
+
+    for run in range(args.warmup + args.runs):
+        course_id = rng.randint(1, args.courses)
+        async with session_factory() as db:
+            started = time.perf_counter()
+            rows, _ = await fetch(db, course_id, params)
+            elapsed = time.perf_counter() - started
+        if run >= args.warmup:
+            latencies.append(elapsed)
+            sizes.append(fetched_bytes(rows))
+
+    # Memory separately: tracemalloc slows everything down
+    for _ in range(min(args.runs, 20)):
+        course_id = rng.randint(1, args.courses)
+        async with session_factory() as db:
+            tracemalloc.start()
+            rows, _ = await fetch(db, course_id, params)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            del rows
+
+    return {
+        "p50_ms": round(1000 * percentile(latencies, 50), 2),
+        "p95_ms": round(1000 * percentile(latencies, 95), 2),
+        "p99_ms": round(1000 * percentile(latencies, 99), 2),
+        "fetched_kb_per_page": round(sum(sizes) / len(sizes) / 1024, 1),
+        "peak_alloc_kb_per_page": round(sorted(peaks)[len(peaks) // 2] / 1024, 1),
+    }
+
+
+async def main_async(args):
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'outline.db')}")
+        started = time.perf_counter()
+        await build(engine, args)
+        build_s = time.perf_counter() - started
+
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        results = {
+            "courses": args.courses,
+            "lessons_per_course": args.lessons,
+            "body_kb": args.body_kb,
+            "page_size": args.page_size,
+            "runs": args.runs,
+            "build_s": round(build_s, 1),
+        }
+        for name, fetch in (("full", full_page), ("outline", outline_page)):
+            results[name] = await measure(name, fetch, session_factory, args)
+        await engine.dispose()
+
+    full, outline = results["full"], results["outline"]
+    results["speedup_p50"] = round(full["p50_ms"] / max(outline["p50_ms"], 1e-6), 1)
+    results["bytes_ratio"] = round(full["fetched_kb_per_page"] / max(outline["fetched_kb_per_page"], 1e-6), 1)
+    return results
+
+
+def main():
+    from app.settings import settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--lessons", type=int, default=300, help="lessons per course")
+    parser.add_argument("--body-kb", type=int, default=20, help="size of each lesson body")
+    parser.add_argument("--page-size", type=int, default=settings.PAGE_SIZE_MAX)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Login-storm benchmark.
+
+Boots app.main:app in-process against a throwaway SQLite database, fires
+a burst of concurrent logins and, at the same time, keeps requesting an
+unrelated page (GET /login). With bcrypt running inline the probe latency
+climbs to seconds; with the hashing pool it should stay flat.
+
+    python scripts/bench_login.py                 # compare inline vs pool
+    python scripts/bench_login.py --workers 2     # single run
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(logins: int, concurrency: int):
+    import httpx
+    from app.main import app
+    from app.database import AsyncSessionLocal
+    from app.models import User
+    from app.auth import get_password_hash
+
+    await app.router.startup()
+
+    async with AsyncSessionLocal() as session:
+        session.add(User(email="bench@example.com", hashed_password=get_password_hash("benchpass")))
+        await session.commit()
+
+    transport = httpx.ASGITransport(app=app)
+    probe_latencies = []
+    login_status = {}
+    storm_done = asyncio.Event()
+
+    async def login_worker(client, n):
+        for _ in range(n):
+            r = await client.post(
+                "/users/login",
+                data={"username": "bench@example.com", "password": "benchpass"},
+            )
+            login_status[r.status_code] = login_status.get(r.status_code, 0) + 1
+
+    async def probe(client):
+        while not storm_done.is_set():
+            t = time.perf_counter()
+            await client.get("/login")
+            probe_latencies.append(time.perf_counter() - t)
+            await asyncio.sleep(0.02)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        probe_task = asyncio.create_task(probe(client))
+        started = time.perf_counter()
+        per_worker = max(1, logins // concurrency)
+        await asyncio.gather(*(login_worker(client, per_worker) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        storm_done.set()
+        await probe_task
+
+    await app.router.shutdown()
+
+    from app.hashing import hasher
+    return {
+        "hash_workers": hasher.workers,
+        "logins": sum(login_status.values()),
+        "login_status": login_status,
+        "login_throughput_per_s": round(sum(login_status.values()) / elapsed, 2),
+        "probe_requests": len(probe_latencies),
+        "probe_p50_ms": round(1000 * percentile(probe_latencies, 50), 1),
+        "probe_p95_ms": round(1000 * percentile(probe_latencies, 95), 1),
+        "probe_max_ms": round(1000 * max(probe_latencies, default=0), 1),
+        "probe_mean_ms": round(1000 * statistics.fmean(probe_latencies), 1) if probe_latencies else 0.0,
+    }
+
+
+def run_child(workers, args):
+    env = dict(os.environ, PASSWORD_HASH_WORKERS=str(workers))
+    cmd = [sys.executable, __file__, "--workers", str(workers),
+           "--logins", str(args.logins), "--concurrency", str(args.concurrency)]
+    out = subprocess.run(cmd, env=env, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, help="hash pool size (0 = inline); omit to compare")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.workers is None:
+        results = [run_child(0, args), run_child(max(1, os.cpu_count() or 1), args)]
+        for r in results:
+            print(json.dumps(r))
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_login_"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.chdir(ROOT)  # templates and static files use relative paths
+    sys.path.insert(0, ROOT)
+
+    print(json.dumps(asyncio.run(run(args.logins, args.concurrency))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Connection pool benchmark.
+
+Runs a burst of concurrent "requests" (check out a connection, run one
+query, hold it briefly, give it back) against two pool setups and
+reports checkout and request latency:
+
+  before  pre-ping on every checkout, no warmup (the old engine)
+  after   the Settings pool: warmed at startup, no pre-ping, recycling
+
+Against SQLite the connect and round-trip costs of Azure SQL are
+simulated with --connect-ms and --rtt-ms; point --url at a real server
+to measure it directly.
+
+    python scripts/bench_pool.py
+    python scripts/bench_pool.py --concurrency 50 --connect-ms 120 --rtt-ms 3
+    python scripts/bench_pool.py --url "mssql+aioodbc://..." --connect-ms 0 --rtt-ms 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def build_engine(url: str, pre_ping: bool, args):
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+    from sqlalchemy.util import await_only
+    from app.settings import settings
+
+    engine = create_async_engine(
+        url,
+        # SQLite defaults to NullPool; use the server pool so there is
+        # something to measure
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=pre_ping,
+    )
+
+    if args.connect_ms:
+        @event.listens_for(engine.sync_engine, "do_connect")
+        def slow_connect(dialect, conn_rec, cargs, cparams):
+            await_only(asyncio.sleep(args.connect_ms / 1000))    # TLS + login
+
+    if args.rtt_ms:
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def slow_query(*_):
+            await_only(asyncio.sleep(args.rtt_ms / 1000))
+
+        # The pre-ping is one more round trip per checkout
+        do_ping = engine.dialect.do_ping
+
+        def slow_ping(dbapi_connection):
+            await_only(asyncio.sleep(args.rtt_ms / 1000))
+            return do_ping(dbapi_connection)
+
+        engine.dialect.do_ping = slow_ping
+
+    return engine
+
+
+async def run(name: str, url: str, pre_ping: bool, warmup: bool, args) -> dict:
+    from sqlalchemy import text
+    from app.database import warm_pool
+
+    engine = build_engine(url, pre_ping, args)
+
+    warm_seconds = 0.0
+    if warmup:
+        started = time.perf_counter()
+        await warm_pool(bind=engine)
+        warm_seconds = time.perf_counter() - started
+
+    checkout_ms, request_ms = [], []
+    remaining = args.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            async with engine.connect() as conn:
+                checked_out = time.perf_counter()
+                await conn.execute(text("SELECT 1"))
+                await asyncio.sleep(args.hold_ms / 1000)
+            checkout_ms.append(1000 * (checked_out - started))
+            request_ms.append(1000 * (time.perf_counter() - started))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    first_wave = request_ms[:args.concurrency]
+    await engine.dispose()
+
+    return {
+        "setup": name,
+        "pre_ping": pre_ping,
+        "warmup_seconds": round(warm_seconds, 3),
+        "checkout_p50_ms": round(percentile(checkout_ms, 50), 2),
+        "checkout_p95_ms": round(percentile(checkout_ms, 95), 2),
+        "checkout_p99_ms": round(percentile(checkout_ms, 99), 2),
+        "request_p50_ms": round(percentile(request_ms, 50), 2),
+        "request_p99_ms": round(percentile(request_ms, 99), 2),
+        "first_wave_max_ms": round(max(first_wave), 2),
+        "requests_per_second": round(args.requests / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="database URL (default: a throwaway SQLite file)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--hold-ms", type=float, default=2.0, help="time each request keeps its connection")
+    parser.add_argument("--connect-ms", type=float, default=80.0, help="simulated connect cost")
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="simulated network round trip")
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        db_file = os.path.join(tempfile.mkdtemp(), "bench_pool.db")
+        url = f"sqlite+aiosqlite:///{db_file}"
+
+    results = [
+        asyncio.run(run("before", url, pre_ping=True, warmup=False, args=args)),
+        asyncio.run(run("after", url, pre_ping=False, warmup=True, args=args)),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Search index benchmark.
+
+Builds the in-process index (app.search.InvertedIndex) over a synthetic
+catalog, then times ranked search and typeahead queries. Documents are
+shaped like the ones app.search indexes: courses with a title and
+description, lessons with a title only (SearchDoc.from_lesson).
+
+    python scripts/bench_search.py --lessons 100000
+"""
+import argparse
+from itertools import accumulate
+import json
+import os
+import random
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def make_vocabulary(size: int, rng: random.Random):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=2000)
+    parser.add_argument("--lessons", type=int, default=100_000)
+    parser.add_argument("--vocabulary", type=int, default=30_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from app.search import InvertedIndex, SearchDoc
+
+    rng = random.Random(args.seed)
+    vocab = make_vocabulary(args.vocabulary, rng)
+    # Zipf-like word frequencies, like real text
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocab))))
+
+    def text(n):
+        return " ".join(rng.choices(vocab, cum_weights=cum_weights, k=n))
+
+    docs = [SearchDoc(("course", cid), text(4), text(40), cid) for cid in range(1, args.courses + 1)]
+    docs += [
+        SearchDoc(("lesson", lid), text(5), None, rng.randint(1, args.courses))
+        for lid in range(1, args.lessons + 1)
+    ]
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+
+    index = InvertedIndex()
+    for doc in docs:
+        index.add(doc, bulk=True)
+    index.finish_bulk()
+
+    build_seconds = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    queries = [" ".join(rng.choices(vocab[:5000], k=rng.randint(1, 3))) for _ in range(args.queries)]
+    prefixes = [rng.choice(vocab[:5000])[:rng.randint(2, 4)] for _ in range(args.queries)]
+
+    search_ms = []
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q, limit=20)
+        search_ms.append(1000 * (time.perf_counter() - t))
+
+    suggest_ms = []
+    for p in prefixes:
+        t = time.perf_counter()
+        index.suggest(p, limit=8)
+        suggest_ms.append(1000 * (time.perf_counter() - t))
+
+    updates = [SearchDoc(("lesson", lid), text(5), None, 1) for lid in range(1, 1001)]
+    t = time.perf_counter()
+    for doc in updates:
+        index.add(doc)
+    update_ms = 1000 * (time.perf_counter() - t) / len(updates)
+
+    print(json.dumps({
+        "documents": len(index),
+        "terms": len(index.postings),
+        "build_seconds": round(build_seconds, 2),
+        "index_rss_mb": round((rss_after - rss_before) / 1024, 1),  # ru_maxrss is KiB on Linux
+        "search_p50_ms": round(percentile(search_ms, 50), 2),
+        "search_p95_ms": round(percentile(search_ms, 95), 2),
+        "search_p99_ms": round(percentile(search_ms, 99), 2),
+        "typeahead_p50_ms": round(percentile(suggest_ms, 50), 2),
+        "typeahead_p95_ms": round(percentile(suggest_ms, 95), 2),
+        "typeahead_p99_ms": round(percentile(suggest_ms, 99), 2),
+        "incremental_update_ms": round(update_ms, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Upload pipeline benchmark (no Azure needed).
+
+Streams synthetic files of increasing size through LocalFileStorage and
+reports throughput and peak Python heap use. Peak memory should stay
+around one chunk whatever the file size. Pass --azure to run the same
+uploads against the configured Azure container instead.
+
+    python scripts/bench_storage.py --sizes-mb 1 64 256
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class FakeUpload:
+    """Mimics UploadFile.read(n) without holding the file in memory."""
+
+    def __init__(self, size: int):
+        self.remaining = size
+        self._block = os.urandom(64 * 1024)
+
+    async def read(self, n: int) -> bytes:
+        n = min(n, self.remaining)
+        self.remaining -= n
+        reps, rest = divmod(n, len(self._block))
+        return self._block * reps + self._block[:rest]
+
+
+async def run(sizes_mb, use_azure: bool):
+    from app.storage import LocalFileStorage, get_storage, iter_upload
+
+    if use_azure:
+        storage = get_storage()
+    else:
+        storage = LocalFileStorage(tempfile.mkdtemp(prefix="bench_storage_"), "/static/uploads")
+
+    results = []
+    for size_mb in sizes_mb:
+        size = size_mb * 1024 * 1024
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        await storage.upload(iter_upload(FakeUpload(size)), f"bench/{size_mb}mb.bin",
+                             content_type="application/octet-stream")
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results.append({
+            "backend": type(storage).__name__,
+            "size_mb": size_mb,
+            "seconds": round(elapsed, 3),
+            "mb_per_s": round(size_mb / elapsed, 1),
+            "peak_heap_mb": round(peak / 1024 / 1024, 2),
+        })
+
+    await storage.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--azure", action="store_true", help="upload to the configured Azure container")
+    args = parser.parse_args()
+
+    for row in asyncio.run(run(args.sizes_mb, args.azure)):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""
+In-process load test.
+
+Generates a synthetic dataset in a SQLite file, boots app.main:app in
+this process against it (no server, no network: requests go through
+httpx's ASGI transport), logs in a pool of virtual users with real
+session cookies and drives a weighted mix of every route for a fixed
+time. Reports p50/p95/p99 latency, throughput and SQL per request for
+each route, and saves everything as JSON for comparing runs.
+
+    python scripts/benchmark.py                          # small dataset, 30s
+    python scripts/benchmark.py --scale large --duration 120
+    python scripts/benchmark.py --courses 10000 --users 1000000 \\
+        --purchases 5000000 --lessons 500000
+    python scripts/benchmark.py --compare build/bench/results-<before>.json
+
+Datasets are cached under build/bench/ by size, so only the first run at
+a given scale pays for generation.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from itertools import accumulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+BENCH_DIR = os.path.join("build", "bench")
+PASSWORD = "benchpass"
+
+SCALES = {
+    #          courses   users      purchases  lessons
+    "tiny":   (100,      1_000,     5_000,     1_000),
+    "small":  (1_000,    20_000,    100_000,   20_000),
+    "medium": (5_000,    200_000,   1_000_000, 100_000),
+    "large":  (10_000,   1_000_000, 5_000_000, 500_000),
+}
+
+WORDS = (
+    "python data api async query index cache model route request session lesson course "
+    "video stream test deploy cloud azure sql join table cursor page search token build "
+    "class function module package error debug profile memory thread process network "
+    "server client header cookie template render static image upload storage queue job"
+).split()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+# -------------------------------------------------------
+# Dataset
+# -------------------------------------------------------
+class Dataset:
+    """
+    Sizes plus the deterministic layout of the generated rows, so the
+    traffic generator knows what each user owns without querying:
+      - lesson i belongs to course (i - 1) % courses + 1
+      - user u's j-th purchase is course (base(u) + j * step) % courses + 1,
+        which never repeats a course for a user
+    """
+
+    def __init__(self, courses, users, purchases, lessons, seed=7):
+        self.courses = courses
+        self.users = users
+        self.purchases = purchases
+        self.lessons = lessons
+        self.seed = seed
+        self.step = self._coprime_step(courses)
+
+    @staticmethod
+    def _coprime_step(n):
+        from math import gcd
+        step = max(1, int(n * 0.618))
+        while gcd(step, n) != 1:
+            step += 1
+        return step
+
+    @property
+    def path(self):
+        name = f"bench-c{self.courses}-u{self.users}-p{self.purchases}-l{self.lessons}-s{self.seed}.db"
+        return os.path.join(BENCH_DIR, name)
+
+    def base(self, user_id):
+        return (user_id * 2654435761 + self.seed) % self.courses
+
+    def purchases_of(self, user_id):
+        per_user, extra = divmod(self.purchases, self.users)
+        return per_user + (1 if user_id <= extra else 0)
+
+    def owned_courses(self, user_id):
+        n = min(self.purchases_of(user_id), self.courses)
+        return [(self.base(user_id) + j * self.step) % self.courses + 1 for j in range(n)]
+
+    def lessons_of(self, course_id, limit=10):
+        return list(range(course_id, self.lessons + 1, self.courses))[:limit]
+
+    def email(self, user_id):
+        return f"user{user_id}@bench.local"
+
+    # -----------------------------
+    def generate(self, chunk=50_000):
+        if os.path.exists(self.path):
+            print(f"Using cached dataset {self.path}")
+            return
+
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        tmp = self.path + ".part"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+        from sqlalchemy import create_engine
+        from app.database import Base
+        from app import models  # noqa: F401  (registers the tables)
+        from app.auth import get_password_hash
+
+        sync_engine = create_engine(f"sqlite:///{tmp}")
+        Base.metadata.create_all(sync_engine)
+        sync_engine.dispose()
+
+        rng = random.Random(self.seed)
+        hashed = get_password_hash(PASSWORD)   # one bcrypt hash shared by every user
+        started = time.perf_counter()
+
+        conn = sqlite3.connect(tmp)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+
+        def text(n):
+            return " ".join(rng.choice(WORDS) for _ in range(n))
+
+        def insert(sql, rows):
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk:
+                    conn.executemany(sql, batch)
+                    batch.clear()
+            if batch:
+                conn.executemany(sql, batch)
+            conn.commit()
+
+        images = sorted(os.listdir(os.path.join("app", "static", "images")))
+        images = [i for i in images if i.endswith(".png")] or [None]
+
+        insert(
+            "INSERT INTO courses (id, title, description, thumbnail_path, price_cents, is_published) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            ((c, f"{text(3).title()} {c}", text(30), images[c % len(images)],
+              rng.choice((0, 999, 1999, 4999)), rng.random() > 0.05)
+             for c in range(1, self.courses + 1)),
+        )
+        insert(
+            "INSERT INTO users (id, email, hashed_password, is_active) VALUES (?, ?, ?, 1)",
+            ((u, self.email(u), hashed) for u in range(1, self.users + 1)),
+        )
+        insert(
+            "INSERT INTO purchases (user_id, course_id, paid) VALUES (?, ?, 1)",
+            ((u, c) for u in range(1, self.users + 1) for c in self.owned_courses(u)),
+        )
+        insert(
+            "INSERT INTO lessons (id, course_id, title, content, video_url) VALUES (?, ?, ?, ?, ?)",
+            ((i, (i - 1) % self.courses + 1, f"Lesson {(i - 1) // self.courses + 1}: {text(3)}",
+              text(60), f"https://www.youtube.com/watch?v=bench{i}")
+             for i in range(1, self.lessons + 1)),
+        )
+        conn.close()
+        os.replace(tmp, self.path)
+        print(f"Generated {self.path} in {time.perf_counter() - started:.1f}s")
+
+
+# -------------------------------------------------------
+# Traffic
+# -------------------------------------------------------
+def route_mix(data: Dataset, rng: random.Random):
+    """(label, weight, method, url factory(user_id) -> (url, form data))."""
+    def course(_u):
+        return rng.randint(1, data.courses)
+
+    def owned(u):
+        return rng.choice(data.owned_courses(u) or [1])
+
+    def owned_lesson(u):
+        lessons = data.lessons_of(owned(u))
+        return lessons and rng.choice(lessons) or 1
+
+    def word(_u):
+        return rng.choice(WORDS)
+
+    def later_page(_u):
+        from app.pagination import encode_cursor
+        return encode_cursor(rng.randint(1, data.courses))
+
+    return [
+        ("GET /",                         10, "GET",  lambda u: ("/", None)),
+        ("GET /courses",                  10, "GET",  lambda u: ("/courses", None)),
+        ("GET /courses?cursor",            4, "GET",  lambda u: (f"/courses?cursor={later_page(u)}", None)),
+        ("GET /courses?q",                 6, "GET",  lambda u: (f"/courses?q={word(u)}", None)),
+        ("GET /courses/ (json)",           6, "GET",  lambda u: ("/courses/", None)),
+        ("GET /courses/search",            6, "GET",  lambda u: (f"/courses/search?q={word(u)}+{word(u)}", None)),
+        ("GET /courses/search/suggest",    8, "GET",  lambda u: (f"/courses/search/suggest?q={word(u)[:2]}", None)),
+        ("GET /course/{id}",              12, "GET",  lambda u: (f"/course/{course(u)}", None)),
+        ("GET /dashboard",                 8, "GET",  lambda u: ("/dashboard", None)),
+        ("GET /profile",                   3, "GET",  lambda u: ("/profile", None)),
+        ("GET /lessons/{course_id}",       8, "GET",  lambda u: (f"/lessons/{owned(u)}", None)),
+        ("GET /lesson/{id}",              10, "GET",  lambda u: (f"/lesson/{owned_lesson(u)}", None)),
+        ("GET /payment/{id}",              2, "GET",  lambda u: (f"/payment/{course(u)}", None)),
+        ("POST /payment/{id}",             1, "POST", lambda u: (f"/payment/{course(u)}", {"card_number": "4242424242424242", "cvv": "123"})),
+        ("GET /login",                     2, "GET",  lambda u: ("/login", None)),
+        ("GET /health",                    1, "GET",  lambda u: ("/health", None)),
+        ("GET /static (asset)",            3, "GET",  lambda u: ("/static/css/style.css", None)),
+    ]
+
+
+async def drive(data: Dataset, args) -> dict:
+    import httpx
+    from app.main import app
+    from app.search import search_service
+    from app.settings import settings
+
+    await app.router.startup()
+
+    if args.wait_for_search:
+        deadline = time.perf_counter() + args.wait_for_search
+        while not search_service.ready and time.perf_counter() < deadline:
+            await asyncio.sleep(0.2)
+
+    rng = random.Random(args.seed)
+    mix = route_mix(data, rng)
+    cum_weights = list(accumulate(weight for _, weight, _, _ in mix))
+
+    samples = {label: [] for label, *_ in mix}
+    statuses = {label: {} for label, *_ in mix}
+    queries = {label: [] for label, *_ in mix}
+    transport = httpx.ASGITransport(app=app)
+
+    # Logins are bcrypt-bound: keep a few in flight and honour Retry-After
+    login_slots = asyncio.Semaphore(max(1, settings.PASSWORD_HASH_MAX_PENDING // 4))
+
+    async def login(client, user_id):
+        for _ in range(20):
+            async with login_slots:
+                r = await client.post("/users/login", data={"username": data.email(user_id), "password": PASSWORD})
+            if r.status_code in (200, 303):
+                return
+            if r.status_code != 503:
+                break
+            await asyncio.sleep(float(r.headers.get("retry-after", 1)))
+        raise RuntimeError(f"login failed for user {user_id}: {r.status_code} {r.text[:200]}")
+
+    users = rng.sample(range(1, data.users + 1), min(args.concurrency, data.users))
+    clients = [httpx.AsyncClient(transport=transport, base_url="http://bench") for _ in users]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login(c, u) for c, u in zip(clients, users)))
+    login_seconds = time.perf_counter() - started
+
+    record_after = time.perf_counter() + args.warmup
+    stop_at = record_after + args.duration
+    recorded = 0
+
+    async def virtual_user(client, user_id):
+        nonlocal recorded
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            label, _, method, url_for = rng.choices(mix, cum_weights=cum_weights)[0]
+            url, form = url_for(user_id)
+
+            t = time.perf_counter()
+            r = await client.request(method, url, data=form)
+            elapsed = time.perf_counter() - t
+
+            if t >= record_after:
+                recorded += 1
+                samples[label].append(elapsed * 1000)
+                statuses[label][r.status_code] = statuses[label].get(r.status_code, 0) + 1
+                if "x-db-query-count" in r.headers:
+                    queries[label].append(int(r.headers["x-db-query-count"]))
+
+    await asyncio.gather(*(virtual_user(c, u) for c, u in zip(clients, users)))
+    measured = time.perf_counter() - record_after
+
+    for client in clients:
+        await client.aclose()
+    await app.router.shutdown()
+
+    routes = {}
+    for label, values in samples.items():
+        if not values:
+            continue
+        routes[label] = {
+            "requests": len(values),
+            "rps": round(len(values) / measured, 1),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(max(values), 2),
+            "statuses": {str(k): v for k, v in sorted(statuses[label].items())},
+            "errors": sum(v for k, v in statuses[label].items() if k >= 500),
+            "queries_avg": round(statistics.mean(queries[label]), 2) if queries[label] else None,
+        }
+
+    everything = [v for values in samples.values() for v in values]
+    return {
+        "routes": routes,
+        "total": {
+            "requests": recorded,
+            "rps": round(recorded / measured, 1),
+            "p50_ms": round(percentile(everything, 50), 2),
+            "p95_ms": round(percentile(everything, 95), 2),
+            "p99_ms": round(percentile(everything, 99), 2),
+            "errors": sum(r["errors"] for r in routes.values()),
+            "login_seconds": round(login_seconds, 2),
+        },
+    }
+
+
+# -------------------------------------------------------
+# Reporting
+# -------------------------------------------------------
+def print_table(results, baseline=None):
+    def fmt(label, row, old):
+        cols = [f"{label:<30}", f"{row['requests']:>7}", f"{row['rps']:>8}"]
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            cell = f"{row[key]:.1f}"
+            if old and key in old and old[key]:
+                cell += f" ({(row[key] - old[key]) / old[key] * 100:+.0f}%)"
+            cols.append(f"{cell:>16}")
+        cols.append(f"{row.get('errors', 0):>6}")
+        return " ".join(cols)
+
+    print(f"{'route':<30} {'reqs':>7} {'rps':>8} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16} {'5xx':>6}")
+    old_routes = (baseline or {}).get("routes", {})
+    for label, row in results["routes"].items():
+        print(fmt(label, row, old_routes.get(label)))
+    print(fmt("TOTAL", results["total"], (baseline or {}).get("total")))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--courses", type=int)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--purchases", type=int)
+    parser.add_argument("--lessons", type=int)
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds first")
+    parser.add_argument("--wait-for-search", type=float, default=120.0,
+                        help="seconds to wait for the search index before starting")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="results file (default: build/bench/results-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    courses, users, purchases, lessons = SCALES[args.scale]
+    data = Dataset(
+        courses=args.courses or courses,
+        users=args.users or users,
+        purchases=args.purchases if args.purchases is not None else purchases,
+        lessons=args.lessons if args.lessons is not None else lessons,
+    )
+
+    # The app reads its settings at import time, so before anything imports it
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.abspath(data.path)}"
+    os.environ.setdefault("ENV", "local")
+
+    data.generate()
+
+    results = asyncio.run(drive(data, args))
+    results["meta"] = {
+        "commit": git_commit(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "dataset": {"courses": data.courses, "users": data.users,
+                    "purchases": data.purchases, "lessons": data.lessons},
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    out = args.out or os.path.join(BENCH_DIR, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Bulk catalog import from CSV or JSONL.
+
+Streams the input, and for every chunk of rows runs one transaction with
+a handful of set-based statements (look up existing keys, executemany
+INSERT, executemany UPDATE), so memory stays flat however big the file
+is and each row costs a fraction of an ORM add().
+
+Rows are upserted on their natural key:
+  course   title
+  lesson   (course title, lesson title)
+
+Columns / keys:
+  course   title, description, thumbnail_path, price_cents, is_published
+  lesson   course (course title) or course_id, title, content, video_url,
+           position (default: after the course's last lesson)
+
+CSV files hold one kind of row (--kind). JSONL rows may mix both with a
+"type": "course" | "lesson" field; courses in a chunk are written before
+its lessons, so a lesson may follow its course in the same file.
+
+    python scripts/import_catalog.py courses.csv --kind courses
+    python scripts/import_catalog.py lessons.jsonl --kind lessons --chunk-size 5000
+    python scripts/import_catalog.py catalog.jsonl          # mixed, "type" per row
+    cat catalog.jsonl | python scripts/import_catalog.py - --format jsonl
+
+Running app processes pick the changes up on their next catalog refresh
+(CATALOG_MAX_AGE_SECONDS), search sync (SEARCH_SYNC_INTERVAL_SECONDS; an
+import that wrote rows asks every process for one full index rebuild)
+and lesson cache expiry (LESSON_CACHE_TTL_SECONDS). Until then a cached
+lesson keeps its old body and previous / next links, so the prefetch
+hint can skip a newly imported lesson for up to that long.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from app.content import rendered_fields
+from app.database import engine
+from app.jobs import utcnow
+from app.models import Course, Lesson, SearchChange
+
+COURSE_COLUMNS = {"title", "description", "thumbnail_path", "price_cents", "is_published"}
+LESSON_COLUMNS = {"title", "content", "video_url", "position"}
+
+COURSE_DEFAULTS = {"description": None, "thumbnail_path": None, "price_cents": 0, "is_published": True}
+LESSON_DEFAULTS = {"content": None, "video_url": None, **rendered_fields(None, None)}
+
+TRUE_STRINGS = {"1", "true", "yes", "y", "t"}
+
+
+class RowError(ValueError):
+    pass
+
+
+# -------------------------------------------------------
+# Input
+# -------------------------------------------------------
+def read_rows(stream, fmt: str, kind: str = None):
+    """Yield (line number, kind, row dict) without reading ahead."""
+    if fmt == "csv":
+        for n, row in enumerate(csv.DictReader(stream), start=2):
+            yield n, kind, {k.strip(): v for k, v in row.items() if k}
+        return
+
+    for n, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield n, None, RowError(f"invalid JSON: {e}")
+            continue
+        row_kind = row.pop("type", None)
+        yield n, (f"{row_kind}s" if row_kind in ("course", "lesson") else kind), row
+
+
+def chunked(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def clean_course(row: dict) -> dict:
+    title = (row.get("title") or "").strip()
+    if not title:
+        raise RowError("course without a title")
+    out = {k: (None if _blank(v) else v) for k, v in row.items() if k in COURSE_COLUMNS}
+    out["title"] = title
+    try:
+        if out.get("price_cents") is not None:
+            out["price_cents"] = int(out["price_cents"])
+    except ValueError:
+        raise RowError(f"bad price_cents: {row.get('price_cents')!r}")
+    if isinstance(out.get("is_published"), str):
+        out["is_published"] = out["is_published"].strip().lower() in TRUE_STRINGS
+    return out
+
+
+def clean_lesson(row: dict) -> dict:
+    title = (row.get("title") or "").strip()
+    if not title:
+        raise RowError("lesson without a title")
+    out = {k: (None if _blank(v) else v) for k, v in row.items() if k in LESSON_COLUMNS}
+    out["title"] = title
+    if out.get("position") is not None:
+        try:
+            out["position"] = int(out["position"])
+        except ValueError:
+            raise RowError(f"bad position: {out['position']!r}")
+    # Core inserts skip the ORM hooks, so render here (see app/content.py)
+    out.update(rendered_fields(**{k: out[k] for k in ("content", "video_url") if k in out}))
+
+    course = row.get("course")
+    course_id = row.get("course_id")
+    if not _blank(course):
+        out["_course"] = str(course).strip()
+    elif not _blank(course_id):
+        try:
+            out["course_id"] = int(course_id)
+        except ValueError:
+            raise RowError(f"bad course_id: {course_id!r}")
+    else:
+        raise RowError("lesson without course or course_id")
+    return out
+
+
+# -------------------------------------------------------
+# Writes (one transaction per chunk)
+# -------------------------------------------------------
+def _group_by_keys(rows):
+    """executemany needs the same keys in every parameter set."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+    return groups.values()
+
+
+async def _update_many(conn, model, rows, key_columns):
+    """UPDATE ... SET <non-key columns> WHERE id = :_id, one executemany per key set."""
+    for group in _group_by_keys(rows):
+        columns = [k for k in group[0] if k != "_id" and k not in key_columns]
+        if not columns:
+            continue
+        # bind names must differ from column names in UPDATE ... SET
+        stmt = (
+            update(model)
+            .where(model.id == bindparam("_id"))
+            .values({c: bindparam(f"v_{c}") for c in columns})
+            .execution_options(synchronize_session=False)
+        )
+        await conn.execute(stmt, [{"_id": r["_id"], **{f"v_{c}": r[c] for c in columns}} for r in group])
+
+
+async def upsert_courses(conn, rows, stats):
+    by_title = {r["title"]: r for r in rows}    # last one wins within a chunk
+    existing = dict((await conn.execute(
+        select(Course.title, Course.id).where(Course.title.in_(list(by_title)))
+    )).all())
+
+    new = [{**COURSE_DEFAULTS, **r} for t, r in by_title.items() if t not in existing]
+    if new:
+        await conn.execute(insert(Course), new)
+
+    changed = [{**r, "_id": existing[t]} for t, r in by_title.items() if t in existing]
+    await _update_many(conn, Course, changed, ("title",))
+
+    stats["courses_inserted"] += len(new)
+    stats["courses_updated"] += len(changed)
+
+
+def rows_with_lines(rows):
+    for row in rows:
+        yield row.pop("_line"), row
+
+
+async def _append_positions(conn, rows):
+    """Give rows without a position the next ones after their course's last lesson."""
+    courses = {r["course_id"] for r in rows if r.get("position") is None}
+    if not courses:
+        return
+    last = dict((await conn.execute(
+        select(Lesson.course_id, func.max(Lesson.position))
+        .where(Lesson.course_id.in_(courses))
+        .group_by(Lesson.course_id)
+    )).all())
+    for row in rows:
+        if row.get("position") is None:
+            last[row["course_id"]] = row["position"] = (last.get(row["course_id"]) or 0) + 1
+
+
+async def upsert_lessons(conn, rows, stats, errors):
+    # Resolve course titles to ids in one query
+    titles = {r["_course"] for r in rows if "_course" in r}
+    course_ids = {}
+    if titles:
+        course_ids = dict((await conn.execute(
+            select(Course.title, Course.id).where(Course.title.in_(list(titles)))
+        )).all())
+
+    keyed = {}
+    for n, row in rows_with_lines(rows):
+        if "_course" in row:
+            course_id = course_ids.get(row.pop("_course"))
+            if course_id is None:
+                errors.append((n, "unknown course"))
+                continue
+            row["course_id"] = course_id
+        keyed[(row["course_id"], row["title"])] = row
+
+    if not keyed:
+        return
+
+    # Two plain IN lists (row-value IN isn't portable to SQL Server); the
+    # few extra matches are dropped by the key lookup
+    existing = {}
+    result = await conn.execute(
+        select(Lesson.course_id, Lesson.title, Lesson.id).where(
+            Lesson.course_id.in_({k[0] for k in keyed}),
+            Lesson.title.in_({k[1] for k in keyed}),
+        )
+    )
+    for course_id, title, lesson_id in result:
+        existing[(course_id, title)] = lesson_id
+
+    new = [{**LESSON_DEFAULTS, **r} for key, r in keyed.items() if key not in existing]
+    await _append_positions(conn, new)
+    if new:
+        await conn.execute(insert(Lesson), new)
+
+    changed = [{**r, "_id": existing[key]} for key, r in keyed.items() if key in existing]
+    await _update_many(conn, Lesson, changed, ("course_id", "title"))
+
+    stats["lessons_inserted"] += len(new)
+    stats["lessons_updated"] += len(changed)
+
+
+# -------------------------------------------------------
+# Driver
+# -------------------------------------------------------
+async def run(stream, fmt, kind, chunk_size, max_errors):
+    stats = dict(rows=0, courses_inserted=0, courses_updated=0,
+                 lessons_inserted=0, lessons_updated=0, errors=0)
+    started = time.perf_counter()
+
+    for chunk in chunked(read_rows(stream, fmt, kind), chunk_size):
+        courses, lessons, errors = [], [], []
+
+        for n, row_kind, row in chunk:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                if row_kind == "courses":
+                    courses.append(clean_course(row))
+                elif row_kind == "lessons":
+                    lesson = clean_lesson(row)
+                    lesson["_line"] = n
+                    lessons.append(lesson)
+                else:
+                    raise RowError("unknown row type (use --kind or a \"type\" field)")
+            except RowError as e:
+                errors.append((n, str(e)))
+
+        async with engine.begin() as conn:
+            if courses:
+                await upsert_courses(conn, courses, stats)
+            if lessons:
+                await upsert_lessons(conn, lessons, stats, errors)
+
+        stats["rows"] += len(chunk)
+        stats["errors"] += len(errors)
+        for n, message in errors[:5]:
+            print(f"  line {n}: {message}", file=sys.stderr)
+
+        elapsed = time.perf_counter() - started
+        print(
+            f"{stats['rows']:>10} rows  {stats['rows'] / elapsed:>9.0f} rows/s  "
+            f"courses +{stats['courses_inserted']} ~{stats['courses_updated']}  "
+            f"lessons +{stats['lessons_inserted']} ~{stats['lessons_updated']}  "
+            f"errors {stats['errors']}",
+            file=sys.stderr,
+        )
+        if max_errors is not None and stats["errors"] > max_errors:
+            print("Too many errors, stopping (earlier chunks are committed)", file=sys.stderr)
+            break
+
+    if stats["courses_inserted"] + stats["courses_updated"] + stats["lessons_inserted"] + stats["lessons_updated"]:
+        # Core statements skip the search change hooks: one marker for all of it
+        async with engine.begin() as conn:
+            await conn.execute(insert(SearchChange).values(doc_type="all", created_at=utcnow()))
+
+    await engine.dispose()
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    parser.add_argument("--kind", choices=("courses", "lessons"), help="row type when rows carry no \"type\"")
+    # 1000 keeps the IN lists under SQL Server's 2100 parameter limit
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows per transaction")
+    parser.add_argument("--max-errors", type=int, default=None, help="stop after this many bad rows")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "csv" if args.path.lower().endswith(".csv") else "jsonl"
+    if fmt == "csv" and not args.kind:
+        parser.error("--kind is required for CSV input")
+
+    if args.path == "-":
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    else:
+        stream = open(args.path, encoding="utf-8", newline="")
+
+    with stream:
+        stats = asyncio.run(run(stream, fmt, args.kind, args.chunk_size, args.max_errors))
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Startup time measurement.
+
+Starts fresh interpreters and times, for each one:
+  import   `import app.main` (module imports, settings, engine creation)
+  boot     the startup handlers (assets, templates, schema, pool, catalog)
+  first    the first GET / after startup
+
+and lists the slowest imports from `python -X importtime`. Track these
+numbers across changes; they are what a new pod pays before it is ready.
+
+    python scripts/measure_startup.py
+    python scripts/measure_startup.py --runs 10 --env production
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def boot():
+    import httpx
+    t0 = time.perf_counter()
+    await app.router.startup()
+    t1 = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        status = (await client.get("/")).status_code
+    t2 = time.perf_counter()
+    await app.router.shutdown()
+    return t1 - t0, t2 - t1, status
+
+if __name__ == "__main__":
+    boot_s, first_s, status = asyncio.run(boot())
+    print("RESULT " + json.dumps({"import": imported - started, "boot": boot_s, "first": first_s, "status": status}))
+"""
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def run_probe(env) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    line = next(l for l in out.splitlines() if l.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def slowest_imports(env, top: int):
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+
+    # Top-level packages only (least indented entry of each chain)
+    totals = {}
+    for self_us, cumulative_us, indent, name in _IMPORTTIME_RE.findall(err):
+        root = name.split(".")[0]
+        if len(indent) <= 1 or root == "app":
+            totals[name] = max(totals.get(name, 0), int(cumulative_us))
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {name: round(us / 1000, 1) for name, us in ranked}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--env", default=None, help="ENV for the app (e.g. production)")
+    parser.add_argument("--top", type=int, default=10, help="how many slow imports to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    if args.env:
+        env["ENV"] = args.env
+
+    runs = [run_probe(env) for _ in range(args.runs)]
+
+    def median_ms(key):
+        return round(1000 * statistics.median(r[key] for r in runs), 1)
+
+    print(json.dumps({
+        "runs": args.runs,
+        "import_ms": median_ms("import"),
+        "boot_ms": median_ms("boot"),
+        "first_request_ms": median_ms("first"),
+        "total_ms": round(median_ms("import") + median_ms("boot") + median_ms("first"), 1),
+        "slowest_imports": slowest_imports(env, args.top),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,64 @@
+"""
+Load sample courses into an empty database.
+
+Seeding used to run inside the web process on every startup; it is a
+one-off step now (run_seed.sh, or after `alembic upgrade head`).
+
+    python scripts/seed_courses.py            # the sample catalog
+    python scripts/seed_courses.py --generated 10
+"""
+import argparse
 import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from sqlalchemy import select
+
 from app.database import engine, AsyncSessionLocal
 from app import models
 
-COURSES = [{'title': f'Course {i}', 'description': f'Description for course {i}', 'thumbnail_path': f'/static/thumbnails/course_{i}.svg', 'price_cents': 1000*i} for i in range(1,11)]
+SAMPLE_COURSES = [
+    {'title': 'Python for Beginners', 'description': 'Learn Python basics.', 'thumbnail_path': 'python.png'},
+    {'title': 'Advanced Python', 'description': 'Master advanced Python techniques.', 'thumbnail_path': 'advanced_python.png'},
+    {'title': 'FastAPI Bootcamp', 'description': 'Build APIs with FastAPI.', 'thumbnail_path': 'fastapi.png'},
+]
+
+
+def generated_courses(n):
+    return [
+        {'title': f'Course {i}', 'description': f'Description for course {i}',
+         'thumbnail_path': f'/static/thumbnails/course_{i}.svg', 'price_cents': 1000 * i}
+        for i in range(1, n + 1)
+    ]
+
+
+async def seed(courses, create_tables: bool):
+    if create_tables:
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
 
-async def seed():
-    async with engine.begin() as conn:
-        await conn.run_sync(models.Base.metadata.create_all)
     async with AsyncSessionLocal() as session:
-        from sqlalchemy import select
-        q = await session.execute(select(models.Course))
-        existing = q.scalars().all()
-        if existing:
+        # One row is enough to know the table isn't empty
+        q = await session.execute(select(models.Course.id).limit(1))
+        if q.first() is not None:
             print('Courses exist, skipping')
             return
-        for c in COURSES:
-            session.add(models.Course(**c))
+        session.add_all(models.Course(**c) for c in courses)
         await session.commit()
-        print('Seeded courses')
+        print(f'Seeded {len(courses)} courses')
+
+    await engine.dispose()
+
 
 if __name__ == '__main__':
-    asyncio.run(seed())
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generated', type=int, metavar='N', help='N numbered placeholder courses instead of the sample catalog')
+    parser.add_argument('--no-create-tables', action='store_true', help='the schema is managed by Alembic')
+    args = parser.parse_args()
+
+    courses = generated_courses(args.generated) if args.generated else SAMPLE_COURSES
+    asyncio.run(seed(courses, create_tables=not args.no_create_tables))
@@ -1,27 +1,42 @@
-import requests, time
-BASE='http://127.0.0.1:8000'
-
-def reg(e,p):
-    r=requests.post(BASE+'/users/register', json={'email':e,'password':p}); print('reg', r.status_code, r.text)
-
-def login(e,p):
-    r=requests.post(BASE+'/users/login', json={'email':e,'password':p}); print('login', r.status_code, r.text); return r.json().get('access_token') if r.ok else None
-
-def courses(t=None):
-    h={} 
-    if t: h['Authorization']='Bearer '+t
-    r=requests.get(BASE+'/courses/', headers=h); print('courses', r.status_code); return r
-
-def pay(e,c,t=None):
-    h={}
-    if t: h['Authorization']='Bearer '+t
-    r=requests.post(BASE+'/payments/simulate', params={'user_email':e,'course_id':c}, headers=h); print('pay', r.status_code, r.text)
-
-if __name__=='__main__':
-    em='tester@example.com'; pw='password123'
-    reg(em,pw)
-    t=login(em,pw)
-    time.sleep(0.5)
-    courses(t)
-    pay(em,1,t)
+import requests, sys
+BASE = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:8000'
+
+# One session, so the login cookie is sent on the following requests
+s = requests.Session()
+
+def check(name, r, ok=(200,)):
+    print(name, r.status_code)
+    if r.status_code not in ok:
+        print(r.text[:500])
+        sys.exit(1)
+    return r
+
+def reg(e, p):
+    r = check('reg', s.post(BASE + '/users/register', params={'email': e, 'password': p}))
+    print(r.json())
+
+def login(e, p):
+    # HTML form login; success redirects and sets the session cookie
+    check('login', s.post(BASE + '/users/login', data={'username': e, 'password': p}, allow_redirects=False), ok=(303,))
+
+def courses():
+    r = check('courses', s.get(BASE + '/courses/'))
+    return r.json()
+
+def pay(course_id):
+    check('pay', s.post(BASE + f'/payment/{course_id}', data={'card_number': '4242424242424242', 'cvv': '123'}))
+
+def dashboard():
+    check('dashboard', s.get(BASE + '/dashboard'))
+
+if __name__ == '__main__':
+    em = 'tester@example.com'; pw = 'password123'
+    reg(em, pw)
+    login(em, pw)
+    listed = courses()
+    if listed:
+        pay(listed[0]['id'])
+        check('lessons', s.get(BASE + f"/lessons/{listed[0]['id']}"))
+    dashboard()
+    check('health', s.get(BASE + '/health'))
     print('done')